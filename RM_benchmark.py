@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the rockmass parameter computations of "RM_lib.py" and the
+output writers of "RM_output.py". Synthetic sweeps with 10^3 to 10^7
+combinations are generated and every method of Hoek and Deformation, the
+vectorized and factorized Batch evaluation, the combination generator and
+the output writers are timed. Throughput (combinations per second) and peak
+memory (traced with tracemalloc) are printed and can be saved to a .csv file
+so that results of different code versions can be compared to find
+regressions.
+
+example usage from the command line:
+    python RM_benchmark.py --sizes 1000 100000 1000000 --output bench.csv
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from RM_lib import Batch, Deformation, Hoek, Utilities, INPUT_COLUMNS
+from RM_output import WRITERS, get_writer
+
+hoek = Hoek()
+deform = Deformation()
+utils = Utilities()
+batch = Batch()
+
+
+def synthetic_inputs(n: int, seed: int = 0) -> pd.DataFrame:
+    '''n random combinations of realistic input parameters'''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'intact UCS [MPa]': rng.uniform(10, 200, n),
+        'GSI': rng.uniform(10, 95, n),
+        'mi': rng.uniform(4, 32, n),
+        'disturbance factor': rng.uniform(0, 1, n),
+        'intact modulus - Ei [MPa]': rng.uniform(5_000, 80_000, n),
+        'unit weight [MN/m³]': rng.uniform(0.022, 0.03, n),
+        'tunnel depth [m]': rng.uniform(10, 1500, n)})
+
+
+def synthetic_sweep(n: int) -> dict:
+    '''input dictionary with roughly n combinations; the sizes of the
+    parameter lists are spread evenly over all input parameters'''
+    sizes = np.ones(len(INPUT_COLUMNS), dtype=int)
+    i = 0
+    while np.prod(sizes) < n:
+        sizes[i % len(sizes)] += 1
+        i += 1
+    df = synthetic_inputs(int(sizes.max()))
+    return {col: list(np.sort(df[col].to_numpy()[:size]))
+            for col, size in zip(INPUT_COLUMNS, sizes)}
+
+
+def measure(func, trace_memory: bool = True) -> tuple:
+    '''wall time [s] and peak memory [MB] of func; tracemalloc slows down
+    Python level code, so the peak memory is measured in a second call'''
+    t_start = time.perf_counter()
+    func()
+    wall_time = time.perf_counter() - t_start
+    if trace_memory is False:
+        return wall_time, np.nan
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return wall_time, peak
+
+
+def benchmark_methods(df: pd.DataFrame) -> dict:
+    '''cases of all methods of Hoek, Deformation and Batch for the inputs of
+    a dataframe; returns a dictionary of names and functions without
+    arguments'''
+    c = {col: df[col].to_numpy() for col in INPUT_COLUMNS}
+    sigci, GSI, mi = c['intact UCS [MPa]'], c['GSI'], c['mi']
+    D, Ei = c['disturbance factor'], c['intact modulus - Ei [MPa]']
+    uw, depth = c['unit weight [MN/m³]'], c['tunnel depth [m]']
+    mb, s, a = hoek.HoekBrownCriterion(mi, GSI, D)
+    _, sig3_max = hoek.FailureEnvelopeRange(sigci, mb, s, a, uw, depth)
+    sigc, _ = hoek.RMStrength(sigci, s, a, mb)
+
+    return {
+        'Hoek.HoekBrownCriterion':
+            lambda: hoek.HoekBrownCriterion(mi, GSI, D),
+        'Hoek.FailureEnvelopeRange':
+            lambda: hoek.FailureEnvelopeRange(sigci, mb, s, a, uw, depth),
+        'Hoek.MohrCoulombFit':
+            lambda: hoek.MohrCoulombFit(sig3_max, sigci, a, mb, s),
+        'Hoek.RMStrength': lambda: hoek.RMStrength(sigci, s, a, mb),
+        'Deformation.RMDef_Hoek (2002)':
+            lambda: deform.RMDef_Hoek(sigci, D, GSI, Ei,
+                                      paper='Hoek et al. (2002)'),
+        'Deformation.RMDef_Hoek (2006)':
+            lambda: deform.RMDef_Hoek(sigci, D, GSI, Ei,
+                                      paper='Hoek & Diederichs (2006)'),
+        'Deformation.RMDef_Verman1997':
+            lambda: deform.RMDef_Verman1997(GSI, depth),
+        'Deformation.RMDef_AsefReddish2002':
+            lambda: deform.RMDef_AsefReddish2002(sigci, 400, sigc, uw, depth,
+                                                 k0=0.33),
+        'Batch.compute_df': lambda: batch.compute_df(df)}
+
+
+def sweep_grid(batch: Batch, dictionary: dict, n: int,
+               chunk_size: int) -> None:
+    '''expands a parameter sweep chunk by chunk with Batch.compute_grid from
+    factors that are computed once for the whole sweep'''
+    factors = batch.compute_factors(dictionary)
+    for i in range(0, n, chunk_size):
+        batch.compute_grid(dictionary, start=i, stop=i + chunk_size,
+                           factors=factors)
+
+
+def run(sizes: list, chunk_size: int = 100_000,
+        writer_max_size: int = 1_000_000,
+        trace_memory: bool = True) -> pd.DataFrame:
+    '''runs all benchmarks for all sizes; writers are only benchmarked up to
+    writer_max_size combinations'''
+    results = []
+
+    def record(stage, name, n, func):
+        wall_time, peak = measure(func, trace_memory)
+        results.append({'size': n, 'stage': stage, 'benchmark': name,
+                        'wall time [s]': wall_time,
+                        'combinations/s': n / wall_time,
+                        'peak memory [MB]': peak})
+        print(f'{n:>10} {name:<40} {wall_time:8.3f} s '
+              f'{n / wall_time:14.0f} /s {peak:10.1f} MB')
+
+    for n in sizes:
+        dictionary = synthetic_sweep(n)
+        n_sweep = utils.n_combinations(dictionary)
+        record('generation', 'Utilities.iter_combinations', n_sweep,
+               lambda: [None for _ in utils.iter_combinations(
+                   dictionary, chunk_size)])
+        record('strength / deformation', 'Batch.compute_grid', n_sweep,
+               lambda: sweep_grid(batch, dictionary, n_sweep, chunk_size))
+
+        df = synthetic_inputs(n)
+        for name, func in benchmark_methods(df).items():
+            stage = 'deformation' if 'Deformation' in name else 'strength'
+            record(stage, name, n, func)
+
+        if n > writer_max_size:
+            continue
+        df = pd.concat([df, batch.compute_df(df)], axis=1)
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt in WRITERS:
+                if fmt == 'xlsx' and n > 100_000:
+                    continue  # excel is only meant for small results
+
+                def write():
+                    with get_writer(os.path.join(tmp, f'bench.{fmt}'),
+                                    n_rows=n) as writer:
+                        for i in range(0, n, chunk_size):
+                            writer.write(df.iloc[i:i + chunk_size])
+                try:
+                    record('output', f'RM_output ({fmt})', n, write)
+                except ImportError:
+                    print(f'{fmt} writer skipped, dependency not installed')
+
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='benchmark the rockmass parameter computations')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000, 1_000_000],
+                        help='numbers of combinations, up to 10^7')
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--writer-max-size', type=int, default=1_000_000,
+                        help='largest size for which writers are benchmarked')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the (slow) measurement of peak memory')
+    parser.add_argument('--output', default=None,
+                        help='.csv file to save the results')
+    args = parser.parse_args()
+
+    df_results = run(args.sizes, chunk_size=args.chunk_size,
+                     writer_max_size=args.writer_max_size,
+                     trace_memory=not args.no_memory)
+    if args.output is not None:
+        df_results.to_csv(args.output, index=False)
@@ -17,11 +17,34 @@ licensed under the MIT License (see license file in repository).
 Parts of the code are based on: http://geologyandpython.com/hoek-brown.html
 """
 
+from contextlib import contextmanager, nullcontext
 from itertools import product
+import json
+import time
+
 import numpy as np
 import pandas as pd
 
 
+# column names of the input parameters in the order of the parameter sweep
+INPUT_COLUMNS = ['intact UCS [MPa]', 'GSI', 'mi', 'disturbance factor',
+                 'intact modulus - Ei [MPa]', 'unit weight [MN/m³]',
+                 'tunnel depth [m]']
+
+# column names of the computed rockmass parameters
+OUTPUT_COLUMNS = ['mb', 's', 'a', 'sig3max [MPa]', 'cohesion [MPa]',
+                  'friction angle [°]', 'RM tensile strength [MPa]',
+                  'RM UCS [MPa]', 'RM global strength [MPa]',
+                  'RM DefMod Hoek&al2002 [MPa]',
+                  'RM DefMod Hoek&Diederichs2006 [MPa]',
+                  'RM DefMod Verman&al1997',
+                  'RM DefMod Asef&Reddish2002 [MPa]']
+
+# quantities of the failure envelopes of Batch.compute_envelopes
+ENVELOPE_QUANTITIES = ['sig3 [MPa]', 'sig1 HB [MPa]', 'sign HB [MPa]',
+                       'tau HB [MPa]', 'sig1 MC [MPa]', 'tau MC [MPa]']
+
+
 class Utilities:
     '''class that contains general purpose functions'''
 
@@ -29,18 +52,190 @@ class Utilities:
         '''compute all possible combinations of lists that are
         values of a dictionary'''
         combinations = list(product(*list(
-            [dictionary['intact UCS [MPa]'],
-             dictionary['GSI'],
-             dictionary['mi'],
-             dictionary['disturbance factor'],
-             dictionary['intact modulus - Ei [MPa]'],
-             dictionary['unit weight [MN/m³]'],
-             dictionary['tunnel depth [m]']])))
+            [dictionary[col] for col in INPUT_COLUMNS])))
         # save combinations
-        df = pd.DataFrame(np.array(combinations), columns=dictionary.keys())
+        df = pd.DataFrame(np.array(combinations), columns=INPUT_COLUMNS)
         df.to_excel(f'{name}_input.xlsx', index=True)
         return df
 
+    def load_rockmass_types(self, filepath: str,
+                            columns: list = INPUT_COLUMNS) -> dict:
+        '''loads the input dictionaries of several rockmass types from a
+        .json, .yaml / .yml or .csv file and returns them as a dictionary with
+        the names of the rockmass types as keys. JSON and YAML files map each
+        name to a dictionary like "inputs" in RM_main.py; CSV files have a
+        column "name" and one column per input parameter where multiple values
+        of a parameter are separated by ";". Only the input parameters in
+        columns are required and loaded, e.g. INPUT_COLUMNS[:-1] if the tunnel
+        depth comes from elsewhere.'''
+        suffix = filepath.rsplit('.', 1)[-1].lower()
+        if suffix == 'json':
+            with open(filepath, encoding='utf-8') as f:
+                types = json.load(f)
+        elif suffix in ['yaml', 'yml']:
+            import yaml  # optional dependency only needed for yaml files
+            with open(filepath, encoding='utf-8') as f:
+                types = yaml.safe_load(f)
+        elif suffix == 'csv':
+            df = pd.read_csv(filepath, dtype=str, encoding='utf-8')
+            missing = set(['name', *columns]) - set(df.columns)
+            if len(missing) > 0:
+                raise ValueError(f'{filepath} has no columns {missing}')
+            types = {row['name']: {col: [float(v) for v in
+                                         str(row[col]).split(';')]
+                                   for col in columns}
+                     for _, row in df.iterrows()}
+        else:
+            raise ValueError(f'unknown file format of {filepath}')
+
+        for name, dictionary in types.items():
+            missing = set(columns) - set(dictionary)
+            if len(missing) > 0:
+                raise ValueError(f'rockmass type {name} has no {missing}')
+            # single values are allowed instead of lists with one value
+            types[name] = {col: list(np.atleast_1d(dictionary[col]))
+                           for col in columns}
+        return types
+
+    def n_combinations(self, dictionary: dict) -> int:
+        '''number of all possible combinations of the input parameters'''
+        return int(np.prod([len(dictionary[col]) for col in INPUT_COLUMNS]))
+
+    def _combinations_at(self, dictionary: dict,
+                         indices: np.ndarray) -> pd.DataFrame:
+        '''builds the combinations with the given integer indices; the
+        indices follow the order of itertools.product in get_combinations'''
+        values = [np.asarray(dictionary[col], dtype=float)
+                  for col in INPUT_COLUMNS]
+        positions = np.unravel_index(indices, [len(v) for v in values])
+        return pd.DataFrame({col: v[pos] for col, v, pos
+                             in zip(INPUT_COLUMNS, values, positions)},
+                            index=indices)
+
+    def get_combination(self, dictionary: dict, index: int) -> pd.Series:
+        '''rebuilds the single combination with the given integer index
+        without generating the other combinations, e.g. to resume a sweep'''
+        n = self.n_combinations(dictionary)
+        if not 0 <= index < n:
+            raise IndexError(f'combination {index} out of range for {n} '
+                             'combinations')
+        return self._combinations_at(dictionary, np.array([index])).iloc[0]
+
+    def iter_combinations(self, dictionary: dict, chunk_size: int = 100_000,
+                          start: int = 0, stop: int = None):
+        '''lazy version of get_combinations that yields dataframes of at most
+        chunk_size combinations; the index of every dataframe holds the global
+        combination indices so that a sweep can be computed and saved chunk by
+        chunk in bounded memory and resumed from any index'''
+        n = self.n_combinations(dictionary)
+        stop = n if stop is None else min(stop, n)
+        for i in range(start, stop, chunk_size):
+            yield self._combinations_at(
+                dictionary, np.arange(i, min(i + chunk_size, stop)))
+
+
+class StageTimer:
+    '''class that collects the wall time per stage of a computation (e.g.
+    generation, strength, deformation, output) to show where large runs spend
+    their time'''
+
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        '''context manager that adds the wall time of its block to a stage'''
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0) + (
+                time.perf_counter() - t_start)
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def iterate(self, name: str, iterable):
+        '''yields the items of an iterable and adds the time that is spent
+        producing them (e.g. by a generator) to a stage'''
+        iterator = iter(iterable)
+        exhausted = object()
+        while True:
+            with self.stage(name):
+                item = next(iterator, exhausted)
+            if item is exhausted:
+                return
+            yield item
+
+    def report(self) -> pd.DataFrame:
+        '''table with total wall time, number of calls and share per stage'''
+        df = pd.DataFrame({'wall time [s]': self.times,
+                           'calls': self.calls})
+        df['share [%]'] = df['wall time [s]'] / df['wall time [s]'].sum() * 100
+        return df
+
+
+class StreamingSummary:
+    '''class that accumulates mean, std, min, max and a histogram of a
+    quantity chunk by chunk without keeping the samples. Partial summaries
+    of different chunks are merged with the parallel algorithm of Chan et al.
+    (1979). Values outside of the histogram edges are counted in an under- and
+    an overflow bin that reach to the min and max, respectively.'''
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.n = 0
+        self.n_invalid = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        finite = np.isfinite(values)
+        self.n_invalid += int((~finite).sum())
+        values = values[finite]
+        if len(values) == 0:
+            return
+        other = StreamingSummary(self.edges)
+        other.n = len(values)
+        other.mean = values.mean()
+        other.M2 = ((values - other.mean)**2).sum()
+        other.min, other.max = values.min(), values.max()
+        other.counts = np.bincount(
+            np.searchsorted(self.edges, values, side='right'),
+            minlength=len(self.counts))
+        self.merge(other)
+
+    def merge(self, other: 'StreamingSummary') -> None:
+        self.n_invalid += other.n_invalid
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.n / n
+        self.M2 = self.M2 + other.M2 + delta**2 * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.counts = self.counts + other.counts
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.M2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    def percentiles(self, q) -> np.ndarray:
+        '''percentiles interpolated linearly within the histogram bins'''
+        if self.n == 0:
+            return np.full(len(np.atleast_1d(q)), np.nan)
+        # outer edges of under- and overflow bins are the extreme values
+        edges = np.concatenate([[min(self.min, self.edges[0])], self.edges,
+                                [max(self.max, self.edges[-1])]])
+        cdf = np.concatenate([[0], np.cumsum(self.counts)]) / self.n
+        p = np.interp(np.asarray(q, dtype=float) / 100, cdf, edges)
+        return np.clip(p, self.min, self.max)
+
 
 class Hoek:
     '''class for computation of the Hoek Brown failure criterium according to
@@ -80,6 +275,36 @@ class Hoek:
         sigtm = (s * sigci)/mb*-1
         return sigc, sigtm
 
+    def FailureEnvelope(self, sig3, sigci: float, mb: float, s: float,
+                        a: float) -> list:
+        '''generalized Hoek Brown failure envelope for the minor principal
+        stresses sig3 in principal stress space (equation 2) and in shear /
+        normal stress space (equations 4, 5 after Balmaz); all inputs have to
+        be broadcastable against each other'''
+        # the base becomes 0 at the tensile strength and must not be negative
+        base = np.maximum(mb*sig3/sigci + s, 0)
+        sig1 = sig3 + sigci*base**a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dsig1dsig3 = 1 + a*mb*base**(a-1)
+            sign = ((sig1+sig3)/2) - (
+                (sig1-sig3)/2)*((dsig1dsig3-1)/(dsig1dsig3+1))
+            tau = (sig1-sig3)*np.sqrt(dsig1dsig3)/(dsig1dsig3+1)
+        # limits at the tensile strength where dsig1dsig3 is infinite
+        sign = np.where(np.isinf(dsig1dsig3), sig3, sign)
+        tau = np.where(np.isinf(dsig1dsig3), 0, tau)
+        return sig1, sign, tau
+
+    def MohrCoulombEnvelope(self, sig3, sign, phi: float,
+                            coh: float) -> list:
+        '''equivalent Mohr Coulomb line (equation 14) for the minor principal
+        stresses sig3 and in shear / normal stress space for the normal
+        stresses sign; phi in degrees'''
+        phi = np.deg2rad(phi)
+        sig1 = (2*coh*np.cos(phi))/(1-np.sin(phi)) + (
+            (1+np.sin(phi))/(1-np.sin(phi)))*sig3
+        tau = coh + sign*np.tan(phi)
+        return sig1, tau
+
 
 class Deformation:
     '''class that contains functions to compute the rockmass deformation moduli
@@ -146,6 +371,237 @@ class Deformation:
         return Erm * 1000
 
 
+class Batch:
+    '''class that evaluates the whole rockmass parameter pipeline (Hoek Brown
+    criterion, Mohr Coulomb fit, rockmass strength and all deformation moduli)
+    for whole arrays of input parameters at once. All methods of Hoek and
+    Deformation are NumPy broadcasts, so one call replaces the row by row
+    loop of RM_main.py and gives the same numbers.'''
+
+    def __init__(self, E_0: float = 400, k0: float = 0.33,
+                 timer: StageTimer = None):
+        # E_0 and k0 are the fixed inputs of RMDef_AsefReddish2002
+        self.E_0 = E_0
+        self.k0 = k0
+        # optional StageTimer that records the strength and deformation stages
+        self.timer = timer
+        self.hoek = Hoek()
+        self.deform = Deformation()
+
+    def _stage(self, name: str):
+        if self.timer is None:
+            return nullcontext()
+        return self.timer.stage(name)
+
+    def compute(self, sigci, GSI, mi, D, Ei, unit_weigth, depth) -> dict:
+        '''computes all rockmass parameters for arrays of input parameters
+        that are broadcastable against each other; returns a dictionary with
+        the OUTPUT_COLUMNS as keys'''
+        sigci, GSI, mi, D, Ei, unit_weigth, depth = (
+            np.asarray(x, dtype=float) for x in (sigci, GSI, mi, D, Ei,
+                                                 unit_weigth, depth))
+
+        with self._stage('strength'):
+            mb, s, a = self.hoek.HoekBrownCriterion(mi, GSI, D)
+            sigcm, sig3_max = self.hoek.FailureEnvelopeRange(
+                sigci, mb, s, a, unit_weigth, depth)
+            phi, coh = self.hoek.MohrCoulombFit(sig3_max, sigci, a, mb, s)
+            sigc, sigtm = self.hoek.RMStrength(sigci, s, a, mb)
+
+        with self._stage('deformation'):
+            ERM_Hoek_0 = self.deform.RMDef_Hoek(sigci, D, GSI, Ei,
+                                                paper='Hoek et al. (2002)')
+            ERM_Hoek_1 = self.deform.RMDef_Hoek(
+                sigci, D, GSI, Ei, paper='Hoek & Diederichs (2006)')
+            ERM_Verman = self.deform.RMDef_Verman1997(GSI, depth)
+            ERM_AsefReddish2002 = self.deform.RMDef_AsefReddish2002(
+                sigci, self.E_0, sigc, unit_weigth, depth, k0=self.k0)
+
+        return dict(zip(OUTPUT_COLUMNS,
+                        [mb, s, a, sig3_max, coh, phi, sigtm, sigc, sigcm,
+                         ERM_Hoek_0, ERM_Hoek_1, ERM_Verman,
+                         ERM_AsefReddish2002]))
+
+    def compute_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        '''computes all rockmass parameters for a dataframe with the
+        INPUT_COLUMNS (e.g. from Utilities.get_combinations); the returned
+        dataframe has the same index as the input dataframe'''
+        results = self.compute(*[df[col].to_numpy() for col in INPUT_COLUMNS])
+        # broadcast scalar results (e.g. constant a) to the number of rows
+        results = {k: np.broadcast_to(v, (len(df),))
+                   for k, v in results.items()}
+        return pd.DataFrame(results, index=df.index)
+
+    def compute_factors(self, dictionary: dict) -> dict:
+        '''factorized evaluation of a parameter sweep: every input list is
+        placed on its own axis of a 7D grid (order of INPUT_COLUMNS), so NumPy
+        broadcasting computes each quantity only once over the axes it depends
+        on, e.g. mb, s, a over (GSI, mi, D) and RMDef_Verman1997 over
+        (GSI, depth). The returned arrays keep length 1 along all other
+        axes.'''
+        n_axes = len(INPUT_COLUMNS)
+        axes = []
+        for i, col in enumerate(INPUT_COLUMNS):
+            shape = [1] * n_axes
+            shape[i] = len(dictionary[col])
+            axes.append(np.asarray(dictionary[col],
+                                   dtype=float).reshape(shape))
+        results = self.compute(*axes)
+        return {k: v.reshape(v.shape + (1,) * (n_axes - v.ndim))
+                for k, v in results.items()}
+
+    def compute_grid(self, dictionary: dict, start: int = 0,
+                     stop: int = None, factors: dict = None) -> pd.DataFrame:
+        '''same result as compute_df(utils.get_combinations(dictionary)) but
+        evaluated with compute_factors and gathered from the factorized
+        arrays; start and stop select a range of combination indices so that
+        large sweeps can be expanded chunk by chunk (see
+        Utilities.iter_combinations). The factors of compute_factors can be
+        passed in so that they are only computed once for all chunks.'''
+        shape = tuple(len(dictionary[col]) for col in INPUT_COLUMNS)
+        n = int(np.prod(shape))
+        stop = n if stop is None else min(stop, n)
+        indices = np.arange(start, stop)
+        positions = np.unravel_index(indices, shape)
+
+        if factors is None:
+            factors = self.compute_factors(dictionary)
+        # gather every quantity only along the axes that it depends on
+        with self._stage('broadcast'):
+            columns = {}
+            for k, v in factors.items():
+                axes = [i for i, size in enumerate(v.shape) if size > 1]
+                values = v.squeeze()[tuple(positions[i] for i in axes)]
+                columns[k] = np.broadcast_to(values, indices.shape)
+            return pd.DataFrame(columns, index=indices)
+
+    def compute_envelopes(self, df: pd.DataFrame, n_points: int = 100,
+                          filename: str = None,
+                          chunk_size: int = 10_000) -> np.ndarray:
+        '''computes the Hoek Brown failure envelopes and the equivalent Mohr
+        Coulomb lines of all rows of a dataframe with the INPUT_COLUMNS. sig3
+        is sampled at n_points from the rockmass tensile strength to sig3max
+        of every case. Returns an array of shape
+        (len(ENVELOPE_QUANTITIES), n_cases, n_points); if a filename is given,
+        the array is a memory-mapped .npy file that is filled chunk by chunk
+        of chunk_size cases.'''
+        shape = (len(ENVELOPE_QUANTITIES), len(df), n_points)
+        if filename is None:
+            envelopes = np.empty(shape)
+        else:
+            envelopes = np.lib.format.open_memmap(filename, mode='w+',
+                                                  dtype=np.float64,
+                                                  shape=shape)
+        t = np.linspace(0, 1, n_points)
+        for i in range(0, len(df), chunk_size):
+            results = self.compute_df(df.iloc[i:i+chunk_size])
+            # one row per case, one column per point of the envelope
+            r = {k: v.to_numpy()[:, None] for k, v in results.items()}
+            sigci = df['intact UCS [MPa]'].to_numpy()[i:i+chunk_size, None]
+
+            sig3 = r['RM tensile strength [MPa]'] + t * (
+                r['sig3max [MPa]'] - r['RM tensile strength [MPa]'])
+            sig1, sign, tau = self.hoek.FailureEnvelope(
+                sig3, sigci, r['mb'], r['s'], r['a'])
+            sig1_MC, tau_MC = self.hoek.MohrCoulombEnvelope(
+                sig3, sign, r['friction angle [°]'], r['cohesion [MPa]'])
+            envelopes[:, i:i+chunk_size] = [sig3, sig1, sign, tau, sig1_MC,
+                                            tau_MC]
+        if filename is not None:
+            envelopes.flush()
+        return envelopes
+
+
+class BackAnalysis:
+    '''class for the vectorized back analysis of rockmass parameters: finds
+    the GSI, disturbance factor or mi that reproduces a target value of any of
+    the OUTPUT_COLUMNS (e.g. cohesion, friction angle, RM UCS or a
+    deformation modulus) for thousands of independent cases at once'''
+
+    # search intervals of the unknown parameters
+    BOUNDS = {'GSI': (10, 100), 'disturbance factor': (0, 1), 'mi': (1, 40)}
+
+    def __init__(self, E_0: float = 400, k0: float = 0.33):
+        self.batch = Batch(E_0=E_0, k0=k0)
+
+    def _residuals(self, df: pd.DataFrame, cases: np.ndarray, unknown: str,
+                   x: np.ndarray, target: str,
+                   values: np.ndarray) -> np.ndarray:
+        '''target quantity minus target value for the unknown parameter x of
+        the given cases; x may have a second axis of trial values'''
+        params = [df[col].to_numpy()[cases] for col in INPUT_COLUMNS]
+        params = [p[:, None] if x.ndim == 2 else p for p in params]
+        params[INPUT_COLUMNS.index(unknown)] = x
+        values = values[cases][:, None] if x.ndim == 2 else values[cases]
+        return self.batch.compute(*params)[target] - values
+
+    def solve(self, df: pd.DataFrame, target: str, values, unknown: str,
+              bounds: tuple = None, n_bracket: int = 8, xtol: float = 1e-6,
+              max_iter: int = 100) -> pd.DataFrame:
+        '''solves target(unknown) = values for every row of a dataframe with
+        the INPUT_COLUMNS (the column of the unknown is ignored). The root is
+        bracketed by evaluating n_bracket points of the search interval for all
+        cases at once and then refined with the Illinois variant of regula
+        falsi, which converges superlinearly and never leaves the bracket.
+        Returns the unknown, whether the case converged (False if there is no
+        root within the bounds), the number of evaluations and the
+        residual.'''
+        if target not in OUTPUT_COLUMNS:
+            raise ValueError(f'unknown target {target}')
+        if unknown not in self.BOUNDS:
+            raise ValueError(f'unknown must be one of {list(self.BOUNDS)}')
+        lo, hi = self.BOUNDS[unknown] if bounds is None else bounds
+        n = len(df)
+        values = np.broadcast_to(np.asarray(values, dtype=float), (n,))
+        cases = np.arange(n)
+
+        # bracketing: first sign change along the trial points of every case
+        trials = np.broadcast_to(np.linspace(lo, hi, n_bracket + 2),
+                                 (n, n_bracket + 2))
+        f = self._residuals(df, cases, unknown, trials, target, values)
+        change = np.sign(f[:, :-1]) * np.sign(f[:, 1:]) <= 0
+        bracketed = change.any(axis=1)
+        j = np.argmax(change, axis=1)
+        a, b = trials[cases, j], trials[cases, j+1]
+        fa, fb = f[cases, j], f[cases, j+1]
+        n_eval = np.full(n, n_bracket + 2)
+
+        x = np.where(np.abs(fa) < np.abs(fb), a, b)
+        residual = np.where(np.abs(fa) < np.abs(fb), fa, fb)
+        converged = bracketed & ((fa == 0) | (fb == 0))
+        active = np.flatnonzero(bracketed & ~converged)
+        for _ in range(max_iter):
+            if len(active) == 0:
+                break
+            c = (a[active]*fb[active] - b[active]*fa[active]) / (
+                fb[active] - fa[active])
+            # bisection if regula falsi leaves the bracket
+            outside = ~((c > np.minimum(a[active], b[active]))
+                        & (c < np.maximum(a[active], b[active])))
+            c = np.where(outside, (a[active] + b[active]) / 2, c)
+            fc = self._residuals(df, active, unknown, c, target, values)
+            n_eval[active] += 1
+
+            flip = fc * fb[active] < 0
+            # Illinois modification: halve the retained end point's residual
+            a[active] = np.where(flip, b[active], a[active])
+            fa[active] = np.where(flip, fb[active], fa[active] / 2)
+            b[active], fb[active] = c, fc
+            x[active], residual[active] = c, fc
+
+            done = (np.abs(b[active] - a[active])
+                    <= xtol * (1 + np.abs(c))) | (fc == 0)
+            converged[active[done]] = True
+            active = active[~done]
+
+        return pd.DataFrame({unknown: np.where(bracketed, x, np.nan),
+                             'converged': converged,
+                             'evaluations': n_eval,
+                             'residual': np.where(bracketed, residual,
+                                                  np.nan)},
+                            index=df.index)
+
+
 if __name__ == '__main__':
     # example usage to determine mb, s, a
 
@@ -7,29 +7,38 @@ Python script that computes rockmass parameters for a set of multiple input
 parameters based on the Hoek Brown failure criterion. An application would be
 if multiple sets of rockmass parameters for different overburdens and / or
 different levels of rockmass disturbance should be computed. The code creates
-two excel files where one contains the input parameters and one the output
-parameters.
+two files where one contains the input parameters and one the output
+parameters (or one file with both if JOIN is True). The output format can be
+.csv, .parquet, .feather, .npy (memory-mapped) or .npz and the combinations
+are computed and saved chunk by chunk; .xlsx holds the whole table in memory
+and is only meant for small sweeps. Optionally a summary of the outputs is
+saved to an excel file.
 
-Code requires the custom library "RM_lib.py" to work.
+Code requires the custom libraries "RM_lib.py" and "RM_output.py" to work.
 
 No guarantee is given on the flawless functionality of the code and the code is
 licensed under the MIT License (see license file in repository).
 Parts of the code are based on: http://geologyandpython.com/hoek-brown.html
 """
 
-import pandas as pd
+from RM_lib import Utilities, Batch, StageTimer
+from RM_output import get_writer, join, ExcelSummaryWriter
 
-from RM_lib import Hoek, Utilities, Deformation
-
-hoek = Hoek()
 utils = Utilities()
-deform = Deformation()
+timer = StageTimer()  # wall time per stage of the computation
+# E_0 and k0 for Asef & Reddish (2002)
+batch = Batch(E_0=400, k0=0.33, timer=timer)
 
 
 ###############################################################################
 # dictionary with input parameters of rockmass type to test
 
 NAME = 'rt1'  # name of rockmass type and filename to save results
+FORMAT = 'csv'  # output format: csv, parquet, feather, npy, npz or xlsx
+JOIN = False  # whether inputs and outputs are saved in one file
+SAVE_SUMMARY = False  # whether an excel summary of the outputs is saved
+CHUNK_SIZE = 100_000  # number of combinations that are computed at once
+TIMING = False  # whether the wall time per stage should be printed
 inputs = {'intact UCS [MPa]': [30, 35],  # sigci
           'GSI': [50],  # GSI
           'mi': [12],  # mi
@@ -42,65 +51,34 @@ inputs = {'intact UCS [MPa]': [30, 35],  # sigci
 ###############################################################################
 # compute rockmass parameters for all possible parameter combinations
 
-df_combinations = utils.get_combinations(inputs, NAME)
-
-# create new dataframe that collects results
-df_output = pd.DataFrame({'mb': [], 's': [], 'a': [], 'sig3max [MPa]': [],
-                          'cohesion [MPa]': [], 'friction angle [°]': [],
-                          'RM tensile strength [MPa]': [], 'RM UCS [MPa]': [],
-                          'RM global strength [MPa]': [],
-                          'RM DefMod Hoek&al2002 [MPa]': [],
-                          'RM DefMod Hoek&Diederichs2006 [MPa]': [],
-                          'RM DefMod Verman&al1997': [],
-                          'RM DefMod Asef&Reddish2002 [MPa]': []
-                          })
-
-# main loop that iterates through all possible combinations
-for i in df_combinations.index:
-    print(f'combination: {i}')
-    c = df_combinations.iloc[i]
-
-    mb, s, a = hoek.HoekBrownCriterion(c['mi'], c['GSI'],
-                                       c['disturbance factor'])
-
-    sigcm, sig3_max = hoek.FailureEnvelopeRange(c['intact UCS [MPa]'], mb, s,
-                                                a, c['unit weight [MN/m³]'],
-                                                c['tunnel depth [m]'])
-
-    phi, coh = hoek.MohrCoulombFit(sig3_max, c['intact UCS [MPa]'], a, mb, s)
-
-    sigc, sigtm = hoek.RMStrength(c['intact UCS [MPa]'], s, a, mb)
-
-    ERM_Hoek_0 = deform.RMDef_Hoek(c['intact UCS [MPa]'],
-                                   c['disturbance factor'],
-                                   c['GSI'], c['intact modulus - Ei [MPa]'],
-                                   paper='Hoek et al. (2002)')
-
-    ERM_Hoek_1 = deform.RMDef_Hoek(c['intact UCS [MPa]'],
-                                   c['disturbance factor'],
-                                   c['GSI'], c['intact modulus - Ei [MPa]'],
-                                   paper='Hoek & Diederichs (2006)')
-
-    ERM_Verman = deform.RMDef_Verman1997(c['GSI'], c['tunnel depth [m]'])
-
-    ERM_AsefReddish2002 = deform.RMDef_AsefReddish2002(
-        c['intact UCS [MPa]'], 400, sigc, c['unit weight [MN/m³]'],
-        c['tunnel depth [m]'], k0=0.33)
-
-    df_temp = pd.DataFrame(
-        {'mb': [mb], 's': [s], 'a': [a],
-         'sig3max [MPa]': [sig3_max],
-         'cohesion [MPa]': [coh],
-         'friction angle [°]': [phi],
-         'RM tensile strength [MPa]': [sigtm],
-         'RM UCS [MPa]': [sigc],
-         'RM global strength [MPa]': [sigcm],
-         'RM DefMod Hoek&al2002 [MPa]': [ERM_Hoek_0],
-         'RM DefMod Hoek&Diederichs2006 [MPa]': [ERM_Hoek_1],
-         'RM DefMod Verman&al1997': [ERM_Verman],
-         'RM DefMod Asef&Reddish2002 [MPa]': [ERM_AsefReddish2002]})
-    df_output = pd.concat([df_output, df_temp])
-
-df_output.index = df_combinations.index
-# save results to excel file
-df_output.to_excel(f'{NAME}_output.xlsx', index=True)
+n_combinations = utils.n_combinations(inputs)
+
+if JOIN is True:
+    writers = {'joined': get_writer(f'{NAME}.{FORMAT}', n_rows=n_combinations)}
+else:
+    writers = {'input': get_writer(f'{NAME}_input.{FORMAT}',
+                                   n_rows=n_combinations),
+               'output': get_writer(f'{NAME}_output.{FORMAT}',
+                                    n_rows=n_combinations)}
+if SAVE_SUMMARY is True:
+    writers['summary'] = ExcelSummaryWriter(f'{NAME}_summary.xlsx')
+
+for df_combinations in timer.iterate(
+        'generation', utils.iter_combinations(inputs, CHUNK_SIZE)):
+    df_output = batch.compute_df(df_combinations)
+
+    with timer.stage('output'):
+        if JOIN is True:
+            writers['joined'].write(join(df_combinations, df_output))
+        else:
+            writers['input'].write(df_combinations)
+            writers['output'].write(df_output)
+        if SAVE_SUMMARY is True:
+            writers['summary'].write(df_output)
+
+with timer.stage('output'):
+    for writer in writers.values():
+        writer.close()
+
+if TIMING is True:
+    print(timer.report())
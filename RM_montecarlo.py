@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Python script that propagates the uncertainty of rockmass input parameters
+through the Hoek Brown failure criterion and the deformation moduli of
+"RM_lib.py" with a Monte Carlo simulation. Instead of fixed lists of inputs,
+the parameters of a rockmass type (e.g. GSI, mi, sigci, D) are given as
+probability distributions (normal, truncated normal, triangular, uniform,
+lognormal) with optional correlations between them.
+
+The samples are drawn and evaluated in vectorized chunks (optionally spread
+across a process pool) and only streaming summaries (mean, std, min, max,
+percentiles, histograms) are kept, so that millions of samples never have to
+sit in memory at once. Every chunk gets its own seed that is derived from one
+master seed, so results are reproducible independently of the number of
+processes.
+
+Code requires the custom library "RM_lib.py" to work.
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from RM_lib import Batch, StreamingSummary, INPUT_COLUMNS, OUTPUT_COLUMNS
+
+
+class Distribution:
+    '''class for the probability distribution of one input parameter. Samples
+    are generated from standard normal scores z, so that correlations can be
+    introduced with a Gaussian copula. Supported kinds and their parameters:
+        'normal': mean, std
+        'truncnormal': mean, std, low, high
+        'triangular': low, mode, high
+        'uniform': low, high
+        'lognormal': mean, std (of the parameter itself, not of its log)
+    '''
+
+    KINDS = {'normal': ('mean', 'std'),
+             'truncnormal': ('mean', 'std', 'low', 'high'),
+             'triangular': ('low', 'mode', 'high'),
+             'uniform': ('low', 'high'),
+             'lognormal': ('mean', 'std')}
+
+    def __init__(self, kind: str, **params):
+        if kind not in self.KINDS:
+            raise ValueError(f'unknown distribution {kind}, choose one of '
+                             f'{list(self.KINDS)}')
+        missing = set(self.KINDS[kind]) - set(params)
+        if len(missing) > 0:
+            raise ValueError(f'{kind} distribution requires {sorted(missing)}')
+        self.kind = kind
+        self.params = params
+
+    def from_normal_scores(self, z: np.ndarray) -> np.ndarray:
+        '''transforms standard normal scores into samples of the
+        distribution'''
+        p = self.params
+        if self.kind == 'normal':
+            return p['mean'] + p['std'] * z
+        elif self.kind == 'lognormal':
+            # parameters of the underlying normal distribution
+            sigma = np.sqrt(np.log(1 + (p['std'] / p['mean'])**2))
+            mu = np.log(p['mean']) - sigma**2 / 2
+            return np.exp(mu + sigma * z)
+
+        u = ndtr(z)
+        if self.kind == 'uniform':
+            return p['low'] + u * (p['high'] - p['low'])
+        elif self.kind == 'truncnormal':
+            lower = ndtr((p['low'] - p['mean']) / p['std'])
+            upper = ndtr((p['high'] - p['mean']) / p['std'])
+            x = p['mean'] + p['std'] * ndtri(lower + u * (upper - lower))
+            return np.clip(x, p['low'], p['high'])
+        elif self.kind == 'triangular':
+            low, mode, high = p['low'], p['mode'], p['high']
+            fc = (mode - low) / (high - low)
+            return np.where(u < fc,
+                            low + np.sqrt(u * (high - low) * (mode - low)),
+                            high - np.sqrt((1 - u) * (high - low)
+                                           * (high - mode)))
+
+
+class MonteCarlo:
+    '''class for the Monte Carlo simulation of rockmass parameters.
+    distributions is a dictionary with INPUT_COLUMNS as keys and either
+    constants or Distribution objects as values. correlations is an optional
+    dictionary with pairs of input columns as keys and the correlation
+    coefficients of their normal scores as values, e.g.
+    {('GSI', 'mi'): 0.5}.'''
+
+    def __init__(self, distributions: dict, correlations: dict = None,
+                 seed: int = None, E_0: float = 400, k0: float = 0.33):
+        missing = set(INPUT_COLUMNS) - set(distributions)
+        if len(missing) > 0:
+            raise ValueError(f'no value or distribution given for {missing}')
+        self.distributions = distributions
+        self.seed = seed
+        self.batch = Batch(E_0=E_0, k0=k0)
+
+        # names of the uncertain parameters and cholesky factor of their
+        # correlation matrix
+        self.uncertain = [col for col in INPUT_COLUMNS
+                          if isinstance(distributions[col], Distribution)]
+        corr = np.eye(len(self.uncertain))
+        for (p1, p2), rho in (correlations or {}).items():
+            if p1 not in self.uncertain or p2 not in self.uncertain:
+                raise ValueError(f'correlation between {p1} and {p2} requires '
+                                 'both parameters to be distributions')
+            i, j = self.uncertain.index(p1), self.uncertain.index(p2)
+            corr[i, j] = corr[j, i] = rho
+        try:
+            self.cholesky = np.linalg.cholesky(corr)
+        except np.linalg.LinAlgError:
+            raise ValueError('correlation matrix is not positive definite')
+
+    def sample(self, n: int, rng: np.random.Generator) -> pd.DataFrame:
+        '''draws n samples of all input parameters'''
+        z = rng.standard_normal((n, len(self.uncertain))) @ self.cholesky.T
+        samples = {}
+        for col in INPUT_COLUMNS:
+            dist = self.distributions[col]
+            if col in self.uncertain:
+                samples[col] = dist.from_normal_scores(
+                    z[:, self.uncertain.index(col)])
+            else:
+                samples[col] = np.full(n, dist, dtype=float)
+        return pd.DataFrame(samples)
+
+    def simulate(self, n: int, rng: np.random.Generator) -> pd.DataFrame:
+        '''draws n samples and computes the rockmass parameters for them;
+        returns inputs and outputs in one dataframe'''
+        df_inputs = self.sample(n, rng)
+        return pd.concat([df_inputs, self.batch.compute_df(df_inputs)],
+                         axis=1)
+
+    def run(self, n_samples: int, chunk_size: int = 100_000,
+            n_workers: int = 1, n_bins: int = 1000,
+            percentiles: tuple = (5, 50, 95)) -> pd.DataFrame:
+        '''runs the simulation in chunks of chunk_size samples on n_workers
+        processes and returns a summary of all inputs and outputs. The
+        histogram edges are fixed with the first chunk; the streaming
+        summaries of all columns are stored in self.summaries afterwards.'''
+        if n_samples < 1:
+            raise ValueError('at least one sample is required')
+        sizes = [min(chunk_size, n_samples - i)
+                 for i in range(0, n_samples, chunk_size)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+
+        # the first chunk fixes the histogram edges of all columns
+        df = self.simulate(sizes[0], np.random.default_rng(seeds[0]))
+        self.summaries = {}
+        for col in df.columns:
+            values = df[col].to_numpy()
+            values = values[np.isfinite(values)]
+            lo, hi = ((values.min(), values.max()) if len(values) > 0
+                      else (0, 1))
+            pad = 0.25 * (hi - lo) if hi > lo else 0.5 * max(abs(lo), 1)
+            self.summaries[col] = StreamingSummary(
+                np.linspace(lo - pad, hi + pad, n_bins + 1))
+            self.summaries[col].update(values)
+        edges = {col: s.edges for col, s in self.summaries.items()}
+
+        jobs = [(self, n, seed, edges)
+                for n, seed in zip(sizes[1:], seeds[1:])]
+        if n_workers > 1:
+            with ProcessPoolExecutor(n_workers) as executor:
+                # map returns results in the order of the chunks, which
+                # keeps the merged summaries deterministic
+                partials = executor.map(_simulate_chunk, jobs)
+                for partial in partials:
+                    self._merge(partial)
+        else:
+            for job in jobs:
+                self._merge(_simulate_chunk(job))
+
+        return self.summary(percentiles)
+
+    def _merge(self, partial: dict) -> None:
+        for col, s in partial.items():
+            self.summaries[col].merge(s)
+
+    def summary(self, percentiles: tuple = (5, 50, 95)) -> pd.DataFrame:
+        '''table with the statistics of all columns'''
+        rows = {}
+        for col, s in self.summaries.items():
+            row = {'n': s.n, 'n invalid': s.n_invalid, 'mean': s.mean,
+                   'std': s.std, 'min': s.min, 'max': s.max}
+            row.update({f'P{q}': v for q, v in
+                        zip(percentiles, s.percentiles(percentiles))})
+            rows[col] = row
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def _simulate_chunk(job: tuple) -> dict:
+    '''simulates one chunk and returns its partial streaming summaries; module
+    level function so that it can be sent to worker processes'''
+    mc, n, seed, edges = job
+    df = mc.simulate(n, np.random.default_rng(seed))
+    partial = {}
+    for col in df.columns:
+        partial[col] = StreamingSummary(edges[col])
+        partial[col].update(df[col].to_numpy())
+    return partial
+
+
+if __name__ == '__main__':
+    # example usage for one uncertain rockmass type
+
+    NAME = 'rt1'  # name of rockmass type and filename to save results
+    distributions = {
+        'intact UCS [MPa]': Distribution('lognormal', mean=35, std=8),
+        'GSI': Distribution('truncnormal', mean=50, std=7, low=10, high=100),
+        'mi': Distribution('triangular', low=9, mode=12, high=15),
+        'disturbance factor': Distribution('uniform', low=0.0, high=0.3),
+        'intact modulus - Ei [MPa]': 12000,
+        'unit weight [MN/m³]': 0.026,
+        'tunnel depth [m]': 100}
+
+    mc = MonteCarlo(distributions, correlations={('GSI', 'mi'): 0.3},
+                    seed=42)
+    df_summary = mc.run(n_samples=1_000_000, chunk_size=100_000, n_workers=4)
+    print(df_summary.loc[OUTPUT_COLUMNS])
+    df_summary.to_excel(f'{NAME}_montecarlo.xlsx', index=True)
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Output backends for the rockmass parameters of "RM_lib.py". All writers take
+dataframes chunk by chunk so that large parameter sweeps can be saved while
+they are computed in bounded memory:
+    'csv': comma separated text file, appended per chunk
+    'parquet': Apache Parquet file, one row group per chunk (requires pyarrow)
+    'feather': Feather / Arrow IPC file, one record batch per chunk (requires
+        pyarrow)
+    'npy': memory-mapped NumPy file with a structured dtype (one field per
+        column); the number of rows has to be known in advance
+    'npz': NumPy archive with one array per column; the columns are streamed
+        into temporary files and zipped on close
+    'xlsx': full Excel file that is kept in memory until it is closed, only
+        for small sweeps below Excel's row limit
+Additionally ExcelSummaryWriter saves only count, mean, std, min and max of
+every numeric column to an Excel file.
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from RM_lib import StreamingSummary
+
+
+EXCEL_MAX_ROWS = 1_048_576 - 1  # one row is needed for the header
+
+
+class Writer:
+    '''base class of the output writers; use as context manager or call
+    close() after the last chunk was written'''
+
+    def __init__(self, filepath: str, **kwargs):
+        self.filepath = filepath
+        self.n_rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CSVWriter(Writer):
+    '''appends every chunk to a .csv file'''
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.filepath, mode='w' if self.n_rows == 0 else 'a',
+                  header=self.n_rows == 0, index=True)
+        self.n_rows += len(df)
+
+
+class ParquetWriter(Writer):
+    '''writes every chunk as a row group of a .parquet file'''
+
+    def __init__(self, filepath: str, **kwargs):
+        super().__init__(filepath)
+        self.writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.filepath, table.schema)
+        self.writer.write_table(table)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+class FeatherWriter(Writer):
+    '''writes every chunk as a record batch of a .feather file (Arrow IPC
+    file format, can be memory-mapped by pyarrow)'''
+
+    def __init__(self, filepath: str, **kwargs):
+        super().__init__(filepath)
+        self.writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        batch = pa.RecordBatch.from_pandas(df, preserve_index=True)
+        if self.writer is None:
+            self.writer = pa.ipc.new_file(self.filepath, batch.schema)
+        self.writer.write_batch(batch)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+class NpyWriter(Writer):
+    '''writes every chunk into a memory-mapped .npy file with a structured
+    dtype; the index is saved in the field "index" and non numeric columns as
+    strings of up to 64 characters. Downstream tools can read the file with
+    np.load(filepath, mmap_mode='r'). close() raises a ValueError if fewer
+    than n_rows rows were written.'''
+
+    def __init__(self, filepath: str, n_rows: int = None, **kwargs):
+        super().__init__(filepath)
+        if n_rows is None:
+            raise ValueError('NpyWriter requires the total number of rows')
+        self.total_rows = n_rows
+        self.array = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.array is None:
+            dtype = [('index', df.index.dtype)] + [
+                (col, np.float64 if pd.api.types.is_numeric_dtype(df[col])
+                 else 'U64') for col in df.columns]
+            self.array = np.lib.format.open_memmap(
+                self.filepath, mode='w+', dtype=dtype,
+                shape=(self.total_rows,))
+        if self.n_rows + len(df) > self.total_rows:
+            raise ValueError(f'more than {self.total_rows} rows written to '
+                             f'{self.filepath}')
+        chunk = self.array[self.n_rows:self.n_rows + len(df)]
+        chunk['index'] = df.index.to_numpy()
+        for col in df.columns:
+            chunk[col] = df[col].to_numpy()
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if self.array is not None:
+            self.array.flush()
+            del self.array
+            self.array = None
+        if self.n_rows != self.total_rows:
+            raise ValueError(f'{self.n_rows} of {self.total_rows} rows written '
+                             f'to {self.filepath}')
+
+
+class NpzWriter(Writer):
+    '''writes every column (and the index) chunk by chunk into a raw
+    temporary file next to the output file; on close the columns are copied
+    into a .npz archive with one array per column, so that only one chunk is
+    in memory at a time. Non numeric columns are saved as strings of up to 64
+    characters.'''
+
+    def __init__(self, filepath: str, compressed: bool = False, **kwargs):
+        super().__init__(filepath)
+        self.compressed = compressed
+        self.tmp_dir = None
+        self.columns = {}  # name: (temporary file, dtype)
+
+    def write(self, df: pd.DataFrame) -> None:
+        arrays = {'index': df.index.to_numpy()}
+        arrays.update({col: df[col].to_numpy() for col in df.columns})
+        if self.tmp_dir is None:
+            self.tmp_dir = tempfile.TemporaryDirectory(
+                dir=os.path.dirname(os.path.abspath(self.filepath)))
+            for i, (name, array) in enumerate(arrays.items()):
+                dtype = (np.dtype('U64') if array.dtype == object
+                         else array.dtype)
+                self.columns[name] = (
+                    open(os.path.join(self.tmp_dir.name, f'{i}.bin'), 'wb'),
+                    dtype)
+        for name, array in arrays.items():
+            f, dtype = self.columns[name]
+            f.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if self.tmp_dir is None:
+            return
+        compression = (zipfile.ZIP_DEFLATED if self.compressed
+                       else zipfile.ZIP_STORED)
+        with zipfile.ZipFile(self.filepath, 'w', compression=compression,
+                             allowZip64=True) as archive:
+            for name, (f, dtype) in self.columns.items():
+                f.close()
+                array = np.memmap(f.name, dtype=dtype, mode='r',
+                                  shape=(self.n_rows,))
+                with archive.open(f'{name}.npy', 'w',
+                                  force_zip64=True) as entry:
+                    np.lib.format.write_array(entry, array)
+                del array
+        self.tmp_dir.cleanup()
+        self.tmp_dir = None
+        self.columns = {}
+
+
+class ExcelWriter(Writer):
+    '''collects all chunks and saves them to an .xlsx file on close; raises a
+    ValueError if the results do not fit into an Excel sheet. All chunks stay
+    in memory until close(), so this writer is only meant for small sweeps;
+    use ExcelSummaryWriter for an Excel summary of large sweeps.'''
+
+    def __init__(self, filepath: str, **kwargs):
+        super().__init__(filepath)
+        self.chunks = []
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.n_rows + len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f'more than {EXCEL_MAX_ROWS} rows do not fit '
+                             'into an Excel sheet, use another output format')
+        self.chunks.append(df)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if len(self.chunks) > 0:
+            pd.concat(self.chunks).to_excel(self.filepath, index=True)
+            self.chunks = []
+
+
+class ExcelSummaryWriter(Writer):
+    '''accumulates count, mean, std, min and max of every numeric column
+    chunk by chunk with the StreamingSummary of "RM_lib.py" and saves
+    them to an .xlsx file on close'''
+
+    def __init__(self, filepath: str, **kwargs):
+        super().__init__(filepath)
+        self.summaries = {}
+
+    def write(self, df: pd.DataFrame) -> None:
+        for col in df.select_dtypes('number').columns:
+            if col not in self.summaries:
+                # no histogram is needed for these statistics
+                self.summaries[col] = StreamingSummary(edges=[])
+            self.summaries[col].update(df[col].to_numpy())
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if len(self.summaries) == 0:
+            return
+        rows = {col: {'count': s.n, 'mean': s.mean if s.n > 0 else np.nan,
+                      'std': s.std,
+                      'min': s.min if s.n > 0 else np.nan,
+                      'max': s.max if s.n > 0 else np.nan}
+                for col, s in self.summaries.items()}
+        pd.DataFrame.from_dict(rows, orient='index').to_excel(self.filepath,
+                                                              index=True)
+        self.summaries = {}
+
+
+WRITERS = {'csv': CSVWriter, 'parquet': ParquetWriter,
+           'feather': FeatherWriter, 'npy': NpyWriter, 'npz': NpzWriter,
+           'xlsx': ExcelWriter}
+
+
+def get_writer(filepath: str, fmt: str = None, **kwargs) -> Writer:
+    '''returns the writer for the given format; if no format is given, it is
+    inferred from the file extension. kwargs are passed to the writer, e.g.
+    n_rows for the 'npy' format.'''
+    if fmt is None:
+        fmt = filepath.rsplit('.', 1)[-1].lower()
+    if fmt not in WRITERS:
+        raise ValueError(f'unknown output format {fmt}, choose one of '
+                         f'{list(WRITERS)}')
+    return WRITERS[fmt](filepath, **kwargs)
+
+
+def join(df_inputs: pd.DataFrame, df_outputs: pd.DataFrame) -> pd.DataFrame:
+    '''joins inputs and outputs with the same index into one table'''
+    return pd.concat([df_inputs, df_outputs], axis=1)
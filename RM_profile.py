@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Python script that computes the rockmass parameters along a tunnel alignment.
+Instead of the Cartesian product of short lists of tunnel depths in
+"RM_main.py", every station of an alignment file is evaluated once with its
+own overburden and the parameters of its rockmass type. The alignment .csv
+needs a column with the chainage, one with the overburden and one with the
+name of the rockmass type at the station; the rockmass types are defined in a
+.json, .yaml or .csv file (see Utilities.load_rockmass_types in "RM_lib.py")
+with one value per input parameter (the tunnel depth of the types is not
+needed and ignored). Only the rockmass types that occur in the alignment are
+checked. The alignment is read and evaluated in chunks of stations, so tens
+of thousands of stations are processed in bounded memory, and the results are
+saved as a profile with one row per chainage.
+
+example usage from the command line:
+    python RM_profile.py alignment.csv rockmass_types.json profile.parquet
+
+Code requires the custom libraries "RM_lib.py" and "RM_output.py" to work.
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import argparse
+
+import pandas as pd
+
+from RM_lib import Batch, Utilities, INPUT_COLUMNS
+from RM_output import get_writer
+
+utils = Utilities()
+batch = Batch(E_0=400, k0=0.33)  # E_0 and k0 for Asef & Reddish (2002)
+
+
+def rockmass_table(rockmass_types: dict) -> pd.DataFrame:
+    '''table with one row of input parameters per rockmass type; raises a
+    ValueError if a type has more than one value for a parameter'''
+    rows = {}
+    for name, inputs in rockmass_types.items():
+        for col in INPUT_COLUMNS[:-1]:  # tunnel depth comes from the profile
+            if len(inputs[col]) != 1:
+                raise ValueError(f'rockmass type {name} must have exactly one '
+                                 f'value of {col} for a profile')
+        rows[name] = [inputs[col][0] for col in INPUT_COLUMNS[:-1]]
+    return pd.DataFrame.from_dict(rows, orient='index',
+                                  columns=INPUT_COLUMNS[:-1], dtype=float)
+
+
+def compute_profile(alignment_file: str, rockmass_types: dict,
+                    output_file: str, chainage_col: str = 'chainage [m]',
+                    depth_col: str = 'overburden [m]',
+                    type_col: str = 'rockmass type',
+                    chunk_size: int = 100_000) -> None:
+    '''computes the rockmass parameters for every station of the alignment
+    file and saves them with the chainage as index to the output file (format
+    from its extension, see RM_output.py)'''
+    # names of rockmass types are compared as strings, also if a config
+    # (e.g. YAML) has numbers as names
+    rockmass_types = {str(name): inputs
+                      for name, inputs in rockmass_types.items()}
+    table = rockmass_table({})
+
+    n_rows = None
+    if output_file.lower().endswith('.npy'):
+        # memory-mapped output needs the number of stations in advance;
+        # counted like the stations below, i.e. without blank lines
+        n_rows = sum(len(df) for df in pd.read_csv(
+            alignment_file, chunksize=chunk_size, usecols=[chainage_col],
+            encoding='utf-8'))
+
+    with get_writer(output_file, n_rows=n_rows) as writer:
+        for df in pd.read_csv(alignment_file, chunksize=chunk_size,
+                              usecols=[chainage_col, depth_col, type_col],
+                              dtype={type_col: str}, encoding='utf-8'):
+            new = set(df[type_col]) - set(table.index)
+            unknown = new - set(rockmass_types)
+            if len(unknown) > 0:
+                raise ValueError(f'unknown rockmass types {unknown} in '
+                                 f'{alignment_file}')
+            if len(new) > 0:
+                # only the types that are used in the alignment are checked
+                table = pd.concat([table, rockmass_table(
+                    {name: rockmass_types[name] for name in sorted(new)})])
+            # map every station to the parameters of its rockmass type
+            df_inputs = table.loc[df[type_col]].set_index(
+                pd.Index(df[chainage_col], name=chainage_col))
+            df_inputs[INPUT_COLUMNS[-1]] = df[depth_col].to_numpy()
+            df_outputs = batch.compute_df(df_inputs)
+            df_outputs.insert(0, type_col, df[type_col].to_numpy())
+            df_outputs.insert(1, INPUT_COLUMNS[-1],
+                              df_inputs[INPUT_COLUMNS[-1]])
+            writer.write(df_outputs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compute rockmass parameters along a tunnel alignment')
+    parser.add_argument('alignment', help='.csv file with the stations')
+    parser.add_argument('config', help='.json, .yaml or .csv file with the '
+                        'input parameters of the rockmass types')
+    parser.add_argument('output', help='output file; .csv, .parquet, '
+                        '.feather, .npy, .npz or .xlsx')
+    parser.add_argument('--chainage-col', default='chainage [m]')
+    parser.add_argument('--depth-col', default='overburden [m]')
+    parser.add_argument('--type-col', default='rockmass type')
+    parser.add_argument('--chunk-size', type=int, default=100_000,
+                        help='number of stations that are computed at once')
+    args = parser.parse_args()
+
+    rockmass_types = utils.load_rockmass_types(args.config,
+                                               columns=INPUT_COLUMNS[:-1])
+    compute_profile(args.alignment, rockmass_types, args.output,
+                    chainage_col=args.chainage_col,
+                    depth_col=args.depth_col, type_col=args.type_col,
+                    chunk_size=args.chunk_size)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Python script that computes the rockmass parameters of many rockmass types in
+one run. The input parameters of all rockmass types are read from one config
+file (.json, .yaml or .csv, see Utilities.load_rockmass_types in "RM_lib.py"),
+the parameter combinations of every type are split into chunks and the chunks
+are spread across a pool of processes. The chunks of a rockmass type are
+merged in the order of their combination indices and the results of a type
+are saved as soon as all of its chunks are finished.
+
+example usage from the command line:
+    python RM_runner.py rockmass_types.json --workers 8 --chunk-size 100000
+
+Code requires the custom libraries "RM_lib.py" and "RM_output.py" to work.
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
+
+from RM_lib import Batch, Utilities
+from RM_output import WRITERS, get_writer, join
+
+utils = Utilities()
+batch = Batch(E_0=400, k0=0.33)  # E_0 and k0 for Asef & Reddish (2002)
+
+
+def compute_chunk(job: tuple) -> tuple:
+    '''computes the rockmass parameters of one chunk of combinations of one
+    rockmass type; job = (name, inputs, start, stop)'''
+    name, inputs, start, stop = job
+    df_inputs = next(utils.iter_combinations(inputs, chunk_size=stop - start,
+                                             start=start, stop=stop))
+    df_outputs = batch.compute_df(df_inputs)
+    return name, start, df_inputs, df_outputs
+
+
+def save_results(name: str, chunks: list, output_dir: str,
+                 fmt: str = 'csv', join_io: bool = False) -> None:
+    '''saves inputs and outputs of one rockmass type chunk by chunk, either
+    in two files like RM_main.py or joined in one file'''
+    n_rows = sum(len(df_outputs) for _, df_outputs in chunks)
+    path = os.path.join(output_dir, name)
+    if join_io is True:
+        with get_writer(f'{path}.{fmt}', n_rows=n_rows) as writer:
+            for df_inputs, df_outputs in chunks:
+                writer.write(join(df_inputs, df_outputs))
+    else:
+        with get_writer(f'{path}_input.{fmt}', n_rows=n_rows) as writer:
+            for df_inputs, _ in chunks:
+                writer.write(df_inputs)
+        with get_writer(f'{path}_output.{fmt}', n_rows=n_rows) as writer:
+            for _, df_outputs in chunks:
+                writer.write(df_outputs)
+
+
+def run(rockmass_types: dict, n_workers: int = None,
+        chunk_size: int = 100_000, output_dir: str = '.', fmt: str = 'csv',
+        join_io: bool = False) -> None:
+    '''computes all rockmass types on a pool of n_workers processes (default:
+    number of CPUs) and saves each type in the output format fmt (see
+    RM_output.py) as soon as it is finished'''
+    jobs = []
+    for name, inputs in rockmass_types.items():
+        n = utils.n_combinations(inputs)
+        jobs += [(name, inputs, start, min(start + chunk_size, n))
+                 for start in range(0, n, chunk_size)]
+    n_total = sum(stop - start for _, _, start, stop in jobs)
+    n_chunks = {name: sum(job[0] == name for job in jobs)
+                for name in rockmass_types}
+    finished = {name: [] for name in rockmass_types}
+
+    os.makedirs(output_dir, exist_ok=True)
+    t_start = t_print = time.perf_counter()
+    n_done = 0
+    with ProcessPoolExecutor(n_workers) as executor:
+        futures = [executor.submit(compute_chunk, job) for job in jobs]
+        for future in as_completed(futures):
+            name, start, df_inputs, df_outputs = future.result()
+            finished[name].append((start, df_inputs, df_outputs))
+            n_done += len(df_outputs)
+
+            if len(finished[name]) == n_chunks[name]:
+                # merge chunks in the order of the combination indices
+                chunks = sorted(finished.pop(name), key=lambda c: c[0])
+                save_results(name, [c[1:] for c in chunks], output_dir,
+                             fmt=fmt, join_io=join_io)
+                print(f'rockmass type {name} saved')
+
+            t_now = time.perf_counter()
+            if t_now - t_print > 1 or n_done == n_total:
+                t_print = t_now
+                print(f'{n_done}/{n_total} combinations, '
+                      f'{n_done / (t_now - t_start):.0f} combinations/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compute rockmass parameters for many rockmass types')
+    parser.add_argument('config', help='.json, .yaml or .csv file with the '
+                        'input parameters of the rockmass types')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=100_000,
+                        help='number of combinations per chunk')
+    parser.add_argument('--output-dir', default='.',
+                        help='directory to save the results')
+    parser.add_argument('--format', default='csv', choices=list(WRITERS),
+                        help='output format; xlsx only for small sweeps')
+    parser.add_argument('--join', action='store_true',
+                        help='save inputs and outputs in one file')
+    args = parser.parse_args()
+
+    run(utils.load_rockmass_types(args.config), n_workers=args.workers,
+        chunk_size=args.chunk_size, output_dir=args.output_dir,
+        fmt=args.format, join_io=args.join)
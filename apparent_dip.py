@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Python script for the calculation of the apparent dip of planes in cross
+sections (background info: https://en.wikipedia.org/wiki/Strike_and_dip).
+The calculation works on arrays of dip directions, dips and azimuths of cross
+sections, so that tables of many planes can be converted for many sections in
+one vectorized pass. The apparent dip is given as ° from vertical (clockwise),
+like in the GUI of "apparent dip calculator.py".
+
+example usage from the command line:
+    python apparent_dip.py planes.csv --sections 0 45 90 135
+        --output apparent_dips.csv
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+def apparent_dip(dipdirs, dips, sections, decimals: int = 1) -> np.ndarray:
+    '''apparent dips [° from vertical, clockwise] of planes with the dip
+    directions and dips in cross sections with the given azimuths; inputs
+    are broadcast against each other. Invalid inputs (dip direction or
+    section azimuth > 360°, dip > 90°) give nan.'''
+    dipdirs = np.asarray(dipdirs, dtype=float)
+    dips = np.asarray(dips, dtype=float)
+    sections = np.asarray(sections, dtype=float)
+    strikes = dipdirs + 90
+    appdips = np.degrees(np.arctan(np.sin(np.radians(sections - strikes))
+                                   * np.tan(np.radians(dips))))
+    appdips = np.round(90 - appdips, decimals)
+    invalid = (dipdirs > 360) | (sections > 360) | (dips > 90)
+    return np.where(invalid, np.nan, appdips)
+
+
+def apparent_dip_table(df: pd.DataFrame, sections: list,
+                       dipdir_col: str = 'dip direction',
+                       dip_col: str = 'dip') -> pd.DataFrame:
+    '''table of the apparent dips of all planes of a dataframe (rows) in all
+    cross sections (columns)'''
+    appdips = apparent_dip(df[dipdir_col].to_numpy()[:, None],
+                           df[dip_col].to_numpy()[:, None],
+                           np.asarray(sections, dtype=float)[None, :])
+    return pd.DataFrame(appdips, index=df.index,
+                        columns=[f'section {s:g}°' for s in sections])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='apparent dips [° from vertical] of planes in cross '
+        'sections')
+    parser.add_argument('planes', help='.csv file with the planes')
+    parser.add_argument('--sections', type=float, nargs='+', required=True,
+                        help='azimuths of the cross sections [°]')
+    parser.add_argument('--dipdir-col', default='dip direction',
+                        help='name of column with dip direction')
+    parser.add_argument('--dip-col', default='dip',
+                        help='name of column with dip')
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--output', default=None,
+                        help='.csv file to save the apparent dips')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.planes, delimiter=args.delimiter)
+    df_appdips = pd.concat([df, apparent_dip_table(
+        df, args.sections, dipdir_col=args.dipdir_col,
+        dip_col=args.dip_col)], axis=1)
+    if args.output is None:
+        print(df_appdips.to_string())
+    else:
+        df_appdips.to_csv(args.output, index=False)
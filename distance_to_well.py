@@ -8,14 +8,33 @@ outcrop, well, geophysical profile etc.).
 Given a set of wells, this code computes and visualizes a raster that contains
 information about the distances from each raster point to the next well.
 
+Running the file without arguments computes the example below. With a
+directory of well .csv files (one file per site, columns "well", "x", "y") the
+sites are computed in parallel on a pool of processes and one raster, image
+and summary is saved per site:
+    python distance_to_well.py wells_dir --config config.json --workers 8
+The optional .json config can contain "dist", "resolution", "tile_size" and
+"save_image" for all sites and a dictionary "sites" with per-site overrides.
+
 Author: Dr. Georg H. Erharter
 First version released: 24. October 2021
 License: MIT License (license file in repository)
 """
 
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import glob
+from itertools import chain
+import json
+import os
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
 
 
 ###############################################################################
@@ -49,12 +68,585 @@ def distance(x: float, y: float, well: list) -> float:
     return np.sqrt(dist_x**2 + dist_y**2)
 
 
+def nearest_well(xs: np.ndarray, ys: np.ndarray, well_coords: np.ndarray,
+                 chunk_size: int = 1_000_000) -> list:
+    ''' computes the distance between every grid point and its nearest well
+    and the index of that well (i.e. a Voronoi map of the wells). The wells
+    are stored in a KD-tree that is queried in chunks of grid points, so the
+    memory is O(grid points + wells) instead of one full grid per well. '''
+    tree = cKDTree(np.asarray(well_coords, dtype=float))
+    points_x, points_y = xs.ravel(), ys.ravel()
+    dists = np.empty(points_x.shape)
+    ids = np.empty(points_x.shape, dtype=np.int64)
+    for i in range(0, len(points_x), chunk_size):
+        chunk = np.column_stack((points_x[i:i+chunk_size],
+                                 points_y[i:i+chunk_size]))
+        dists[i:i+chunk_size], ids[i:i+chunk_size] = tree.query(chunk)
+    return dists.reshape(xs.shape), ids.reshape(xs.shape)
+
+
+def uncertainty_metrics(xs: np.ndarray, ys: np.ndarray,
+                        well_coords: np.ndarray, k: int = 3,
+                        radius: float = 50, power: float = 2,
+                        min_distance: float = 1,
+                        chunk_size: int = 1_000_000) -> dict:
+    ''' computes several uncertainty metrics for every grid point from one
+    k-nearest-neighbour query of the wells per chunk of grid points:
+    distance to the nearest and to the k-th nearest well, mean distance to
+    the k nearest wells, number of wells within radius and the inverse
+    distance weighted data density sum(1 / d**power) of the k nearest wells
+    (distances below min_distance are set to min_distance). Only grid points
+    with all k neighbours within radius need a second (radius) query to count
+    the wells. '''
+    well_coords = np.asarray(well_coords, dtype=float)
+    tree = cKDTree(well_coords)
+    k = min(k, len(well_coords))
+    points_x, points_y = xs.ravel(), ys.ravel()
+    names = ['distance to nearest well', f'distance to {k}. nearest well',
+             f'mean distance to {k} nearest wells',
+             f'wells within {radius}', 'IDW data density']
+    metrics = {name: np.empty(points_x.shape) for name in names}
+
+    for i in range(0, len(points_x), chunk_size):
+        chunk = np.column_stack((points_x[i:i+chunk_size],
+                                 points_y[i:i+chunk_size]))
+        d, _ = tree.query(chunk, k=k)
+        d = d.reshape(len(chunk), k)
+        count = (d <= radius).sum(axis=1)
+        saturated = np.flatnonzero(count == k)
+        if len(saturated) > 0 and k < len(well_coords):
+            count[saturated] = tree.query_ball_point(
+                chunk[saturated], radius, return_length=True)
+        window = slice(i, i + chunk_size)
+        metrics[names[0]][window] = d[:, 0]
+        metrics[names[1]][window] = d[:, -1]
+        metrics[names[2]][window] = d.mean(axis=1)
+        metrics[names[3]][window] = count
+        metrics[names[4]][window] = (
+            1 / np.maximum(d, min_distance)**power).sum(axis=1)
+
+    return {name: m.reshape(xs.shape) for name, m in metrics.items()}
+
+
+def raster_shape(ll, ur, RESOLUTION) -> tuple:
+    ''' number of rows (y) and columns (x) of a raster with the lower left
+    cell at ll and a cell size of RESOLUTION that covers the extent to ur '''
+    n_x = int(np.floor((ur[0] - ll[0]) / RESOLUTION + 1e-9)) + 1
+    n_y = int(np.floor((ur[1] - ll[1]) / RESOLUTION + 1e-9)) + 1
+    return n_y, n_x
+
+
+def compute_distance_raster_tiled(well_coords: np.ndarray, ll, ur,
+                                  RESOLUTION: float, filename: str,
+                                  tile_size: int = 1024) -> np.ndarray:
+    ''' computes the distance raster tile by tile directly from the grid
+    origin ll and the resolution without building meshgrids of the whole
+    extent. The tiles are written into a memory-mapped float32 .npy file
+    (rows from south to north like imshow(origin='lower')); the index of the
+    nearest well goes to "<filename>_ids.npy" and the georeference (origin,
+    resolution, shape) to a "<filename>.json" header. '''
+    tree = cKDTree(np.asarray(well_coords, dtype=float))
+    shape = raster_shape(ll, ur, RESOLUTION)
+    base = filename[:-4] if filename.endswith('.npy') else filename
+    raster = np.lib.format.open_memmap(f'{base}.npy', mode='w+',
+                                       dtype=np.float32, shape=shape)
+    ids = np.lib.format.open_memmap(f'{base}_ids.npy', mode='w+',
+                                    dtype=np.int32, shape=shape)
+
+    for r0 in range(0, shape[0], tile_size):
+        r1 = min(r0 + tile_size, shape[0])
+        tile_ys = ll[1] + RESOLUTION * np.arange(r0, r1)
+        for c0 in range(0, shape[1], tile_size):
+            c1 = min(c0 + tile_size, shape[1])
+            tile_xs = ll[0] + RESOLUTION * np.arange(c0, c1)
+            points = np.column_stack((np.tile(tile_xs, len(tile_ys)),
+                                      np.repeat(tile_ys, len(tile_xs))))
+            d, i = tree.query(points)
+            raster[r0:r1, c0:c1] = d.reshape(r1 - r0, c1 - c0)
+            ids[r0:r1, c0:c1] = i.reshape(r1 - r0, c1 - c0)
+
+    raster.flush()
+    ids.flush()
+    header = {'origin': [float(ll[0]), float(ll[1])],
+              'resolution': float(RESOLUTION), 'shape': list(shape),
+              'rows': 'south to north', 'nodata': None}
+    with open(f'{base}.json', 'w') as f:
+        json.dump(header, f, indent=2)
+    return raster
+
+
+def load_raster(filename: str) -> list:
+    ''' opens a raster of compute_distance_raster_tiled as memory-map and
+    returns it together with its header '''
+    base = filename[:-4] if filename.endswith('.npy') else filename
+    with open(f'{base}.json') as f:
+        header = json.load(f)
+    return np.load(f'{base}.npy', mmap_mode='r'), header
+
+
+class DistanceRaster:
+    ''' persistent distance raster that keeps the distance to the nearest
+    well and the index of the nearest well of every cell. Wells can be added
+    and removed with add_well / remove_well, which only recompute the cells
+    whose nearest well can change, so "what if we drill here?" scenarios can be
+    screened interactively. Cells are laid out like in
+    compute_distance_raster_tiled (origin ll, rows from south to north). '''
+
+    def __init__(self, well_dict: dict, ll, ur, RESOLUTION: float,
+                 tile_size: int = 256):
+        self.ll = np.asarray(ll, dtype=float)
+        self.RESOLUTION = RESOLUTION
+        self.tile_size = tile_size
+        self.shape = raster_shape(ll, ur, RESOLUTION)
+        self.xs = self.ll[0] + RESOLUTION * np.arange(self.shape[1])
+        self.ys = self.ll[1] + RESOLUTION * np.arange(self.shape[0])
+        # indices of the wells stay valid after removals; removed wells are
+        # set to None. Without wells all cells are inf until a well is added.
+        self.names = list(well_dict.keys())
+        self.coords = np.array(list(well_dict.values()),
+                               dtype=float).reshape(-1, 2)
+
+        self.distances = np.full(self.shape, np.inf)
+        self.ids = np.full(self.shape, -1, dtype=np.int64)
+        self._recompute(np.ones(self.shape, dtype=bool))
+
+        # bounding boxes of the tiles and the max. distance within each tile
+        self.tile_rows = np.arange(0, self.shape[0], tile_size)
+        self.tile_cols = np.arange(0, self.shape[1], tile_size)
+        self.tile_max = np.array([[self._tile(r, c)[0].max()
+                                   for c in self.tile_cols]
+                                  for r in self.tile_rows])
+
+    @property
+    def wells(self) -> dict:
+        ''' dictionary of the current wells '''
+        return {name: list(c) for name, c in zip(self.names, self.coords)
+                if name is not None}
+
+    def _tile(self, r: int, c: int) -> list:
+        ''' views of distances and ids of the tile with the first row r and
+        the first column c '''
+        window = (slice(r, r + self.tile_size), slice(c, c + self.tile_size))
+        return self.distances[window], self.ids[window]
+
+    def _recompute(self, mask: np.ndarray) -> None:
+        ''' recomputes the cells of a boolean mask from all current wells '''
+        active = np.array([name is not None for name in self.names])
+        rows, cols = np.nonzero(mask)
+        if active.sum() == 0:
+            self.distances[rows, cols], self.ids[rows, cols] = np.inf, -1
+            return
+        tree = cKDTree(self.coords[active])
+        d, i = tree.query(np.column_stack((self.xs[cols], self.ys[rows])))
+        self.distances[rows, cols] = d
+        self.ids[rows, cols] = np.flatnonzero(active)[i]
+
+    def add_well(self, name: str, coords: list) -> int:
+        ''' adds a well and updates the cells within its area of influence;
+        tiles that are farther from the well than their max. distance to the
+        existing wells are skipped. Returns the number of changed cells. '''
+        if name in self.names:
+            raise ValueError(f'well {name} already exists')
+        self.names.append(name)
+        self.coords = np.vstack((self.coords, np.asarray(coords, dtype=float)))
+        well_id = len(self.names) - 1
+        x, y = self.coords[well_id]
+
+        # min. distance between the well and the bounding box of every tile
+        x0 = self.xs[self.tile_cols]
+        x1 = self.xs[np.minimum(self.tile_cols + self.tile_size,
+                                self.shape[1]) - 1]
+        y0 = self.ys[self.tile_rows]
+        y1 = self.ys[np.minimum(self.tile_rows + self.tile_size,
+                                self.shape[0]) - 1]
+        dx = np.maximum(np.maximum(x0 - x, x - x1), 0)
+        dy = np.maximum(np.maximum(y0 - y, y - y1), 0)
+        lower_bound = np.hypot(dx[None, :], dy[:, None])
+
+        n_changed = 0
+        for ti, tj in zip(*np.nonzero(lower_bound < self.tile_max)):
+            r, c = self.tile_rows[ti], self.tile_cols[tj]
+            tile_d, tile_ids = self._tile(r, c)
+            d = np.hypot(self.xs[c:c + self.tile_size][None, :] - x,
+                         self.ys[r:r + self.tile_size][:, None] - y)
+            closer = d < tile_d
+            tile_d[closer] = d[closer]
+            tile_ids[closer] = well_id
+            n_changed += int(closer.sum())
+            self.tile_max[ti, tj] = tile_d.max()
+        return n_changed
+
+    def remove_well(self, name: str) -> int:
+        ''' removes a well and recomputes only the cells that had it as
+        nearest well. Returns the number of changed cells. '''
+        if name not in self.names:
+            raise ValueError(f'well {name} does not exist')
+        well_id = self.names.index(name)
+        self.names[well_id] = None
+        mask = self.ids == well_id
+        self._recompute(mask)
+
+        # update the max. distance of the affected tiles
+        for ti, r in enumerate(self.tile_rows):
+            for tj, c in enumerate(self.tile_cols):
+                window = (slice(r, r + self.tile_size),
+                          slice(c, c + self.tile_size))
+                if mask[window].any():
+                    self.tile_max[ti, tj] = self.distances[window].max()
+        return int(mask.sum())
+
+
+def load_trajectories(filepath: str, well_col: str = 'well',
+                      coord_cols: tuple = ('x', 'y', 'z')) -> dict:
+    ''' loads 3D well trajectories (survey points ordered along the
+    well path) from a .csv file with one row per survey point '''
+    df = pd.read_csv(filepath)
+    return {name: group[list(coord_cols)].to_numpy(dtype=float)
+            for name, group in df.groupby(well_col, sort=False)}
+
+
+def trajectory_segments(trajectories: dict,
+                        max_length: float = None) -> list:
+    ''' splits the trajectories into straight segments; segments longer than
+    max_length (default: twice the median segment length) are subdivided so
+    that the spatial index over the segments stays tight. Returns start
+    points, end points and the index of the well of every segment. '''
+    starts, ends, ids = [], [], []
+    for i, path in enumerate(trajectories.values()):
+        path = np.atleast_2d(path)
+        if len(path) == 1:  # vertical well given by one point only
+            path = np.vstack((path, path))
+        starts.append(path[:-1])
+        ends.append(path[1:])
+        ids.append(np.full(len(path) - 1, i))
+    starts, ends, ids = (np.concatenate(starts), np.concatenate(ends),
+                         np.concatenate(ids))
+
+    lengths = np.linalg.norm(ends - starts, axis=1)
+    if max_length is None:
+        max_length = max(2 * np.median(lengths), 1e-9)
+    n_parts = np.maximum(np.ceil(lengths / max_length), 1).astype(int)
+    # fraction of the segment at the start and end of every part
+    rep = np.repeat(np.arange(len(starts)), n_parts)
+    k = np.arange(len(rep)) - np.repeat(np.cumsum(n_parts) - n_parts, n_parts)
+    t0 = (k / n_parts[rep])[:, None]
+    t1 = ((k + 1) / n_parts[rep])[:, None]
+    vec = ends[rep] - starts[rep]
+    return starts[rep] + t0 * vec, starts[rep] + t1 * vec, ids[rep]
+
+
+def point_segment_distance(points: np.ndarray, starts: np.ndarray,
+                           ends: np.ndarray) -> np.ndarray:
+    ''' distances between points (n, 3) and segments; starts and ends have
+    either the shape (k, 3) for all combinations (result (n, k)) or the shape
+    (n, k, 3) for k individual segments per point '''
+    vec = ends - starts
+    rel = points[:, None, :] - starts
+    length_sq = (vec**2).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip((rel * vec).sum(axis=-1) / length_sq, 0, 1)
+    t = np.where(length_sq > 0, t, 0)  # degenerated segments are points
+    return np.linalg.norm(rel - t[..., None] * vec, axis=-1)
+
+
+def segment_index(trajectories: dict) -> tuple:
+    ''' spatial index over the segments of the well trajectories: start
+    points, end points, well index of every segment, KD-tree of the segment
+    midpoints and the max. half length of the segments. Build it once and
+    pass it to distance_to_trajectories when many batches of points are
+    queried against the same trajectories. '''
+    starts, ends, ids = trajectory_segments(trajectories)
+    half_length = np.linalg.norm(ends - starts, axis=1).max() / 2
+    return starts, ends, ids, cKDTree((starts + ends) / 2), half_length
+
+
+def distance_to_trajectories(points: np.ndarray, trajectories: dict = None,
+                             n_candidates: int = 8,
+                             chunk_size: int = 100_000,
+                             index: tuple = None) -> list:
+    ''' computes the min. 3D distance between points (n, 3) and all segments
+    of the well trajectories and the index of the nearest well. The segments
+    are indexed by their bounding spheres (KD-tree of the midpoints + max. half
+    length, see segment_index; a prebuilt index can be given instead of the
+    trajectories): every point is compared with the n_candidates segments with
+    the nearest midpoints. Where a segment outside of the candidates could
+    still be closer, the point is compared with all segments whose midpoints
+    lie within the distance to the best candidate + the max. half length. '''
+    if index is None:
+        index = segment_index(trajectories)
+    starts, ends, ids, tree, half_length = index
+    n_segments = len(starts)
+    k = min(n_candidates, n_segments)
+
+    dists = np.empty(len(points))
+    nearest = np.empty(len(points), dtype=np.int64)
+    for i in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[i:i+chunk_size], dtype=float)
+        mid_d, cand = tree.query(chunk, k=k)
+        mid_d, cand = mid_d.reshape(len(chunk), k), cand.reshape(len(chunk), k)
+        d = point_segment_distance(chunk, starts[cand], ends[cand])
+        best = d.argmin(axis=1)
+        d_min = d[np.arange(len(chunk)), best]
+        seg = cand[np.arange(len(chunk)), best]
+
+        # the nearest segment has a midpoint closer than d_min + half_length
+        unsure = np.flatnonzero(mid_d[:, -1] <= d_min + half_length)
+        if k == n_segments:  # all segments were candidates
+            unsure = unsure[:0]
+        # candidate segments of the unsure points as flat (point, segment)
+        # pairs, in batches to bound the number of pairs in memory
+        batch = max(chunk_size // 10, 1)
+        for j in range(0, len(unsure), batch):
+            sub = unsure[j:j + batch]
+            balls = tree.query_ball_point(chunk[sub], d_min[sub] + half_length)
+            counts = np.array([len(b) for b in balls])
+            pair_seg = np.fromiter(chain.from_iterable(balls),
+                                   dtype=np.int64, count=counts.sum())
+            pair_pt = np.repeat(sub, counts)
+            d_pairs = point_segment_distance(
+                chunk[pair_pt], starts[pair_seg][:, None],
+                ends[pair_seg][:, None])[:, 0]
+            # smallest distance per point (pairs are grouped by point)
+            order = np.lexsort((d_pairs, pair_pt))
+            first = order[np.cumsum(counts) - counts]
+            closer = d_pairs[first] < d_min[sub]
+            d_min[sub[closer]] = d_pairs[first][closer]
+            seg[sub[closer]] = pair_seg[first][closer]
+
+        dists[i:i+chunk_size], nearest[i:i+chunk_size] = d_min, ids[seg]
+    return dists, nearest
+
+
+def compute_distance_voxels(trajectories: dict, ll, ur, z_levels: list,
+                            RESOLUTION: float, filename: str = None,
+                            chunk_size: int = 100_000) -> np.ndarray:
+    ''' computes the 3D distance to the nearest trajectory for every voxel
+    of a grid with the lower left corner ll, the upper right corner ur, the
+    horizontal resolution RESOLUTION and the elevations z_levels (a single
+    level gives the distances along e.g. a tunnel horizon). Returns an array
+    of shape (len(z_levels), n_y, n_x) that is a memory-mapped float32 .npy
+    file if a filename is given. '''
+    n_y, n_x = raster_shape(ll, ur, RESOLUTION)
+    shape = (len(z_levels), n_y, n_x)
+    if filename is None:
+        voxels = np.empty(shape, dtype=np.float32)
+    else:
+        voxels = np.lib.format.open_memmap(filename, mode='w+',
+                                           dtype=np.float32, shape=shape)
+    flat = voxels.reshape(-1)
+    n = flat.size
+    index = segment_index(trajectories)  # built once for all chunks
+    for i in range(0, n, chunk_size):
+        k, r, c = np.unravel_index(np.arange(i, min(i + chunk_size, n)),
+                                   shape)
+        points = np.column_stack((ll[0] + RESOLUTION * c,
+                                  ll[1] + RESOLUTION * r,
+                                  np.asarray(z_levels, dtype=float)[k]))
+        flat[i:i + chunk_size] = distance_to_trajectories(
+            points, chunk_size=chunk_size, index=index)[0]
+    if filename is not None:
+        voxels.flush()
+    return voxels
+
+
+def build_pyramid(grid: np.ndarray, min_size: int = 64) -> list:
+    ''' builds downsampled versions of a raster by averaging blocks of 2 x 2
+    cells (odd rows / columns are padded with the edge values) until one side
+    is shorter than min_size; the first level is the raster itself '''
+    pyramid = [np.asarray(grid)]
+    while min(pyramid[-1].shape) // 2 >= min_size:
+        level = pyramid[-1]
+        level = np.pad(level, ((0, level.shape[0] % 2),
+                               (0, level.shape[1] % 2)), mode='edge')
+        pyramid.append(level.reshape(level.shape[0] // 2, 2,
+                                     level.shape[1] // 2, 2).mean(axis=(1, 3)))
+    return pyramid
+
+
+def select_level(pyramid: list, n_pixels: tuple) -> tuple:
+    ''' coarsest level of a pyramid that still has at least n_pixels
+    (rows, columns), i.e. the resolution that is needed for an output, and its
+    downsampling factor (number of raster cells per side of a level cell) '''
+    for k in reversed(range(len(pyramid))):
+        level = pyramid[k]
+        if level.shape[0] >= n_pixels[0] and level.shape[1] >= n_pixels[1]:
+            return level, 2**k
+    return pyramid[0], 1
+
+
+def level_centres(level: np.ndarray, factor: int, ll,
+                  RESOLUTION: float) -> tuple:
+    ''' x and y coordinates of the cell centres of a pyramid level; a cell of
+    the level averages factor x factor raster cells, so its centre is offset
+    by (factor - 1) / 2 raster cells from the centre of its first cell '''
+    offset = RESOLUTION * (factor - 1) / 2
+    xs = ll[0] + offset + RESOLUTION * factor * np.arange(level.shape[1])
+    ys = ll[1] + offset + RESOLUTION * factor * np.arange(level.shape[0])
+    return xs, ys
+
+
+def plot_distance_map(distance_grid: np.ndarray, ll, ur, RESOLUTION: float,
+                      well_dict: dict, filename: str = None,
+                      figsize: tuple = (8, 6), dpi: int = 600,
+                      contour_points: int = 200, max_labels: int = 50,
+                      pyramid: list = None,
+                      title: str = 'exemplary well-distance uncertainty '
+                      'estimation'):
+    ''' plots a distance raster with contour lines and wells. The raster is
+    drawn from the pyramid level that matches the output resolution, contour
+    lines are computed on a level with about contour_points cells per side
+    and all wells are drawn with one scatter call (names only for up to
+    max_labels wells). If a filename is given, the image is rendered headless
+    with the Agg backend and saved without touching pyplot's state;
+    otherwise a pyplot figure is returned. '''
+    if pyramid is None:
+        pyramid = build_pyramid(distance_grid)
+    if filename is None:
+        fig, ax = plt.subplots(figsize=figsize)
+    else:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+
+    # add raster image to plot
+    n_pixels = (int(figsize[1] * dpi), int(figsize[0] * dpi))
+    level, factor = select_level(pyramid, n_pixels)
+    xs, ys = level_centres(level, factor, ll, RESOLUTION)
+    half = RESOLUTION * factor / 2
+    im = ax.imshow(level, cmap='RdYlGn_r', origin='lower',
+                   extent=(xs[0]-half, xs[-1]+half, ys[0]-half, ys[-1]+half))
+
+    # add distance contour lines to plot
+    level, factor = select_level(pyramid, (contour_points, contour_points))
+    xs, ys = level_centres(level, factor, ll, RESOLUTION)
+    CS = ax.contour(xs, ys, level, colors='black', alpha=0.5)
+    ax.clabel(CS, CS.levels, inline=True, fmt='%d')
+    # padded cells of coarse levels reach beyond the raster
+    ax.set_xlim(ll[0]-RESOLUTION/2, ur[0]+RESOLUTION/2)
+    ax.set_ylim(ll[1]-RESOLUTION/2, ur[1]+RESOLUTION/2)
+
+    # add well positions to plot
+    coords = np.array(list(well_dict.values()))
+    ax.scatter(coords[:, 0], coords[:, 1], color='grey', edgecolor='black',
+               marker='D')
+    if len(well_dict) <= max_labels:
+        for name, d in well_dict.items():
+            ax.annotate(name, (d[0]+1, d[1]+1))
+
+    # add colorbar to plot
+    divider = make_axes_locatable(ax)
+    cax = divider.append_axes("right", size="5%", pad=0.05)
+
+    cbar = fig.colorbar(im, cax=cax)
+    cbar.set_label('distance to wells [m]')
+
+    # add title to plot
+    ax.set_title(title)
+
+    fig.tight_layout()
+    if filename is not None:
+        fig.savefig(filename, dpi=dpi)
+    return fig
+
+
+def load_wells(filepath: str, name_col: str = 'well', x_col: str = 'x',
+               y_col: str = 'y') -> dict:
+    ''' loads a well dictionary (well names: well coordinates) from a .csv
+    file '''
+    df = pd.read_csv(filepath)
+    return {str(name): [x, y] for name, x, y
+            in zip(df[name_col], df[x_col], df[y_col])}
+
+
+def compute_site(well_dict: dict, DIST: float, RESOLUTION: float,
+                 name: str = 'distance', output_dir: str = '.',
+                 tile_size: int = 1024, save_image: bool = True,
+                 max_image_size: int = 4000) -> dict:
+    ''' computes the distance raster of one site tile by tile into
+    "<output_dir>/<name>.npy" (see compute_distance_raster_tiled), so the peak
+    memory is bounded by tile_size, and saves an image from a strided view of
+    the raster with at most max_image_size cells per side and a .json summary.
+    Returns the summary. '''
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, name)
+    ll, ur = compute_grid_extent(well_dict, DIST)
+    raster = compute_distance_raster_tiled(np.array(list(well_dict.values())),
+                                           ll, ur, RESOLUTION, f'{base}.npy',
+                                           tile_size=tile_size)
+
+    # statistics of the raster, accumulated tile row by tile row
+    n, total, d_max = 0, 0.0, 0.0
+    for r in range(0, raster.shape[0], tile_size):
+        rows = np.asarray(raster[r:r + tile_size], dtype=np.float64)
+        n += rows.size
+        total += rows.sum()
+        d_max = max(d_max, rows.max())
+    summary = {'site': name, 'wells': len(well_dict),
+               'origin': [float(ll[0]), float(ll[1])],
+               'resolution': RESOLUTION, 'shape': list(raster.shape),
+               'mean distance': total / n, 'max distance': float(d_max)}
+    with open(f'{base}_summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    if save_image is True:
+        step = max(int(np.ceil(max(raster.shape) / max_image_size)), 1)
+        preview = np.asarray(raster[::step, ::step])
+        ur_preview = (ll[0] + RESOLUTION * step * (preview.shape[1] - 1),
+                      ll[1] + RESOLUTION * step * (preview.shape[0] - 1))
+        plot_distance_map(preview, ll, ur_preview, RESOLUTION * step,
+                          well_dict, filename=f'{base}.png',
+                          title=f'well-distance uncertainty estimation {name}')
+    return summary
+
+
+def _compute_site_job(job: tuple) -> dict:
+    ''' unpacks one job of run_sites for the process pool '''
+    well_file, settings, output_dir = job
+    name = os.path.splitext(os.path.basename(well_file))[0]
+    return compute_site(load_wells(well_file), settings['dist'],
+                        settings['resolution'], name=name,
+                        output_dir=output_dir,
+                        tile_size=settings['tile_size'],
+                        save_image=settings['save_image'])
+
+
+def run_sites(well_dir: str, config: dict = None, n_workers: int = None,
+              output_dir: str = '.') -> list:
+    ''' computes all sites (.csv files of well_dir) on a pool of n_workers
+    processes and saves one raster, image and summary per site plus a
+    summary .csv of all sites; returns the summaries in the order of the
+    files '''
+    config = {} if config is None else config
+    defaults = {'dist': DIST, 'resolution': RESOLUTION, 'tile_size': 1024,
+                'save_image': True}
+    defaults.update({k: v for k, v in config.items() if k != 'sites'})
+
+    jobs = []
+    for well_file in sorted(glob.glob(os.path.join(well_dir, '*.csv'))):
+        name = os.path.splitext(os.path.basename(well_file))[0]
+        settings = dict(defaults, **config.get('sites', {}).get(name, {}))
+        jobs.append((well_file, settings, output_dir))
+
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(n_workers) as executor:
+        summaries = []
+        for summary in executor.map(_compute_site_job, jobs):
+            print(f"site {summary['site']} finished")
+            summaries.append(summary)
+    pd.DataFrame(summaries).to_csv(os.path.join(output_dir, 'summary.csv'),
+                                   index=False)
+    return summaries
+
+
 ###############################################################################
 # static variables / constants and well dictionary
 
 DIST = 30  # [m] extend of grid beyond wells
 RESOLUTION = 1  # [m]  resolution of grid
 SAVE_RASTER = False  # whether or not a .csv raster should be saved
+# whether or not a memory-mapped binary raster (.npy + .json header) should be
+# computed tile by tile; suitable for very large grids
+SAVE_BINARY_RASTER = False
 SAVE_IMAGE = True  # whether or not an image of the distances should be saved
 
 # dictionary with wells: keys= well names, values= well koordinates
@@ -71,53 +663,61 @@ wells = {'W0': [1000, 1000],
 ###############################################################################
 # computation of distances
 
-ll, ur = compute_grid_extent(wells, DIST)
-xs, ys = compute_grid_coords(ll, ur, RESOLUTION)
-
-# compute min distance between each grid point and all wells
-dists = [distance(xs, ys, well) for well in list(wells.values())]
-distance_grid = np.dstack(dists).min(axis=2)
-
-# eventually save result as coordinates with scalar values
-if SAVE_RASTER is True:
-    distance_raster = np.vstack((xs.flatten(), ys.flatten(),
-                                 distance_grid.flatten())).T
-    np.savetxt(r'distance_raster.csv', distance_raster, delimiter=',')
-
-###############################################################################
-# result visualization
-
-fig, ax = plt.subplots(figsize=(8, 6))
 
-# add raster image to plot
-im = ax.imshow(distance_grid, cmap='RdYlGn_r', origin='lower',
-               extent=(ll[0]-RESOLUTION/2, ur[0]+RESOLUTION/2,
-                       ll[1]-RESOLUTION/2, ur[1]+RESOLUTION/2))
+def run_example():
+    ''' computes and visualizes the distance raster of the exemplary wells
+    with the constants above '''
+    ll, ur = compute_grid_extent(wells, DIST)
+    # grid points at ll + RESOLUTION * i like compute_distance_raster_tiled,
+    # so the raster lines up with the wells in plot_distance_map
+    n_y, n_x = raster_shape(ll, ur, RESOLUTION)
+    xs, ys = np.meshgrid(ll[0] + RESOLUTION * np.arange(n_x),
+                         ll[1] + RESOLUTION * np.arange(n_y))
+    ur = (xs[0, -1], ys[-1, 0])  # centre of the last cell
 
-# add distance contour lines to plot
-CS = ax.contour(xs, ys, distance_grid,
-                colors='black', alpha=0.5, origin='lower',
-                extent=(ll[0]-RESOLUTION/2, ur[0]+RESOLUTION/2,
-                        ll[1]-RESOLUTION/2, ur[1]+RESOLUTION/2))
+    # compute min distance between each grid point and all wells and the
+    # index of the nearest well of each grid point
+    distance_grid, nearest_well_grid = nearest_well(
+        xs, ys, np.array(list(wells.values())))
 
-ax.clabel(CS, CS.levels, inline=True, fmt='%d')
+    # eventually save result as coordinates with scalar values
+    if SAVE_RASTER is True:
+        distance_raster = np.vstack((xs.flatten(), ys.flatten(),
+                                     distance_grid.flatten())).T
+        np.savetxt(r'distance_raster.csv', distance_raster, delimiter=',')
 
-# add well positions to plot
-for i, d in enumerate(list(wells.values())):
-    ax.scatter(d[0], d[1], color='grey', edgecolor='black', marker='D')
-    ax.annotate(list(wells.keys())[i], (d[0]+1, d[1]+1))
+    if SAVE_BINARY_RASTER is True:
+        compute_distance_raster_tiled(np.array(list(wells.values())), ll, ur,
+                                      RESOLUTION, 'distance_raster.npy')
 
-# add colorbar to plot
-divider = make_axes_locatable(ax)
-cax = divider.append_axes("right", size="5%", pad=0.05)
+    # result visualization
+    fig = plot_distance_map(distance_grid, ll, ur, RESOLUTION, wells)
+    # eventually save a visualization of the distance map
+    if SAVE_IMAGE is True:
+        fig.savefig('distance_to_wells.png', dpi=600)
+    plt.show()
 
-cbar = plt.colorbar(im, cax=cax)
-cbar.set_label('distance to wells [m]')
 
-# add title to plot
-ax.set_title('exemplary well-distance uncertainty estimation')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compute well-distance rasters for many sites')
+    parser.add_argument('well_dir', nargs='?', default=None,
+                        help='directory with one .csv file of wells per site;'
+                        ' without it the example is computed')
+    parser.add_argument('--config', default=None,
+                        help='.json file with the settings of the sites')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes (default: number of CPUs)')
+    parser.add_argument('--output-dir', default='.',
+                        help='directory to save the results')
+    args = parser.parse_args()
 
-plt.tight_layout()
-# eventually save a visualization of the distance map
-if SAVE_IMAGE is True:
-    plt.savefig('distance_to_wells.png', dpi=600)
+    if args.well_dir is None:
+        run_example()
+    else:
+        config = None
+        if args.config is not None:
+            with open(args.config) as f:
+                config = json.load(f)
+        run_sites(args.well_dir, config, n_workers=args.workers,
+                  output_dir=args.output_dir)
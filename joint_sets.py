@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Python script that recovers joint sets from large numbers of orientation
+measurements, e.g. the 10^5 to 10^6 facet orientations of a photogrammetry or
+lidar survey. The unit normals of the planes (see
+stereonet.calc_normal_vectors) are clustered with a spherical k-means with
+antipodal symmetry, i.e. a normal and its opposite belong to the same set and
+the mean of a set is the principal axis of its orientation matrix. Optionally
+the sets are refined with a mixture of axial von Mises-Fisher distributions
+(Fisher distributions that are symmetric to the origin) fitted with the
+expectation maximization algorithm.
+All points are processed vectorized per iteration in chunks of bounded size
+and large inputs are clustered with mini-batches (Sculley 2010). The result
+are the mean orientation, Fisher's K and the number of members of every set
+and a label per measurement, which can directly be used for per-set colors in
+stereonet.plot_poles.
+
+Code requires the custom library "stereonet.py" for the example to work.
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class JointSets:
+    '''class for the clustering of orientation data into n_sets joint sets.
+    method is 'kmeans' for the spherical k-means with antipodal symmetry or
+    'vmf' for a subsequent fit of a mixture of axial von Mises-Fisher
+    distributions. If batch_size is given and smaller than the number of
+    measurements, the k-means runs on random mini-batches of that size. The
+    clustering is repeated n_init times from different k-means++ seeds and
+    the solution with the lowest inertia is kept.'''
+
+    def __init__(self, n_sets: int, method: str = 'kmeans',
+                 batch_size: int = None, max_iter: int = 100,
+                 tol: float = 1e-6, n_init: int = 3, seed: int = None,
+                 chunk_size: int = 100_000):
+        if method not in ['kmeans', 'vmf']:
+            raise ValueError(f'unknown method {method}, choose kmeans or vmf')
+        self.n_sets = n_sets
+        self.method = method
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.tol = tol
+        self.n_init = n_init
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def fit(self, n_vecs: tuple) -> 'JointSets':
+        '''clusters the normals n_vecs = (n_X, n_Y, n_Z) as returned by
+        stereonet.calc_normal_vectors. Afterwards the following attributes
+        are set:
+            centers: mean normals of the sets, (n_sets, 3), pointing upwards
+            kappas: Fisher's K of the sets
+            counts: number of measurements per set
+            weights: mixing proportions of the sets
+            labels: index of the set of every measurement'''
+        X = self._unit_vectors(n_vecs)
+        if len(X) < self.n_sets:
+            raise ValueError(f'{len(X)} measurements are not enough for '
+                             f'{self.n_sets} joint sets')
+        rng = np.random.default_rng(self.seed)
+
+        best = None
+        for _ in range(self.n_init):
+            centers = self._kmeans(X, rng)
+            inertia = self._inertia(X, centers)
+            if best is None or inertia < best[0]:
+                best = (inertia, centers)
+        self.inertia, centers = best
+
+        if self.method == 'vmf':
+            self._fit_vmf(X, centers)
+            self.labels = self.predict(n_vecs)
+            self.counts = np.bincount(self.labels, minlength=self.n_sets)
+        else:
+            self.centers = centers
+            self.labels = self._assign(X, centers)
+            self.counts = np.bincount(self.labels, minlength=self.n_sets)
+            self.weights = self.counts / len(X)
+            self.kappas = self._fisher_k(X, self.labels, centers)
+
+        # normals point upwards like the ones of stereonet.calc_normal_vectors
+        self.centers = np.where(self.centers[:, 2:] < 0, -self.centers,
+                                self.centers)
+        return self
+
+    def predict(self, n_vecs: tuple) -> np.ndarray:
+        '''index of the most likely set of every normal'''
+        X = self._unit_vectors(n_vecs)
+        if self.method == 'vmf':
+            return np.concatenate([
+                self._log_likelihoods(X[i:i+self.chunk_size]).argmax(axis=1)
+                for i in range(0, len(X), self.chunk_size)])
+        return self._assign(X, self.centers)
+
+    def mean_orientations(self) -> tuple:
+        '''dips and dip directions [°] of the mean planes of all sets'''
+        n_X, n_Y, n_Z = self.centers.T
+        dips = np.degrees(np.arccos(np.clip(n_Z, -1, 1)))
+        dipdirs = np.degrees(np.arctan2(n_X, n_Y)) % 360
+        return dips, dipdirs
+
+    def summary(self) -> pd.DataFrame:
+        '''table with mean orientation, Fisher's K, number of members and
+        weight of every set'''
+        dips, dipdirs = self.mean_orientations()
+        return pd.DataFrame({'dip [°]': dips, 'dip direction [°]': dipdirs,
+                             'Fisher K': self.kappas, 'n': self.counts,
+                             'weight': self.weights},
+                            index=pd.RangeIndex(self.n_sets, name='set'))
+
+    def _unit_vectors(self, n_vecs: tuple) -> np.ndarray:
+        X = np.column_stack(n_vecs).astype(float)
+        return X / np.linalg.norm(X, axis=1)[:, None]
+
+    def _assign(self, X: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        '''index of the closest axis (largest |cos|) for every vector'''
+        return np.concatenate([
+            np.abs(X[i:i+self.chunk_size] @ centers.T).argmax(axis=1)
+            for i in range(0, len(X), self.chunk_size)])
+
+    def _inertia(self, X: np.ndarray, centers: np.ndarray) -> float:
+        '''sum of the squared sines between the vectors and their axes'''
+        return sum(
+            (1 - (np.abs(X[i:i+self.chunk_size] @ centers.T).max(axis=1))**2
+             ).sum() for i in range(0, len(X), self.chunk_size))
+
+    def _init_centers(self, X: np.ndarray,
+                      rng: np.random.Generator) -> np.ndarray:
+        '''k-means++ seeding with the axial distance 1 - cos² on a sample of
+        at most 10000 vectors'''
+        if len(X) > 10_000:
+            X = X[rng.choice(len(X), 10_000, replace=False)]
+        centers = [X[rng.integers(len(X))]]
+        dist = np.maximum(1 - (X @ centers[0])**2, 0)
+        for _ in range(1, self.n_sets):
+            p = dist / dist.sum() if dist.sum() > 0 else None
+            centers.append(X[rng.choice(len(X), p=p)])
+            dist = np.minimum(dist, np.maximum(1 - (X @ centers[-1])**2, 0))
+        return np.array(centers)
+
+    def _scatter_matrices(self, X: np.ndarray, centers: np.ndarray) -> tuple:
+        '''orientation matrices sum(x x^T) and number of members of the sets
+        for the vectors X assigned to their closest axes'''
+        k = self.n_sets
+        T = np.zeros(k * 9)
+        counts = np.zeros(k)
+        for i in range(0, len(X), self.chunk_size):
+            x = X[i:i+self.chunk_size]
+            labels = np.abs(x @ centers.T).argmax(axis=1)
+            outer = (x[:, :, None] * x[:, None, :]).reshape(-1, 9)
+            idx = labels[:, None] * 9 + np.arange(9)
+            T += np.bincount(idx.ravel(), weights=outer.ravel(),
+                             minlength=k * 9)
+            counts += np.bincount(labels, minlength=k)
+        return T.reshape(k, 3, 3), counts
+
+    def _principal_axes(self, T: np.ndarray, counts: np.ndarray,
+                        centers: np.ndarray) -> np.ndarray:
+        '''eigenvectors of the largest eigenvalues of the orientation
+        matrices; empty sets keep their previous axis'''
+        axes = np.linalg.eigh(T)[1][:, :, -1]
+        return np.where(counts[:, None] > 0, axes, centers)
+
+    def _kmeans(self, X: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        '''axes of the sets after the spherical k-means'''
+        centers = self._init_centers(X, rng)
+        mini_batch = self.batch_size is not None and self.batch_size < len(X)
+        if mini_batch is True:
+            T = np.zeros((self.n_sets, 3, 3))
+            seen = np.zeros(self.n_sets)
+
+        for _ in range(self.max_iter):
+            if mini_batch is True:
+                batch = X[rng.integers(0, len(X), self.batch_size)]
+                T_batch, counts = self._scatter_matrices(batch, centers)
+                # per-set learning rate 1 / number of members seen so far
+                seen += counts
+                eta = np.divide(counts, seen, out=np.zeros(self.n_sets),
+                                where=seen > 0)[:, None, None]
+                T = ((1 - eta) * T + eta * T_batch
+                     / np.maximum(counts, 1)[:, None, None])
+                new = self._principal_axes(T, seen, centers)
+            else:
+                T, counts = self._scatter_matrices(X, centers)
+                new = self._principal_axes(T, counts, centers)
+            shift = 1 - np.abs((new * centers).sum(axis=1)).min()
+            centers = new
+            if shift < self.tol:
+                break
+        return centers
+
+    def _fisher_k(self, X: np.ndarray, labels: np.ndarray,
+                  centers: np.ndarray) -> np.ndarray:
+        '''Fisher's K = (n - 1) / (n - R) of every set after flipping its
+        members into the hemisphere of the mean axis'''
+        resultants = np.zeros((self.n_sets, 3))
+        for i in range(0, len(X), self.chunk_size):
+            x, lab = X[i:i+self.chunk_size], labels[i:i+self.chunk_size]
+            x = x * np.sign((x * centers[lab]).sum(axis=1))[:, None]
+            for j in range(3):
+                resultants[:, j] += np.bincount(lab, weights=x[:, j],
+                                                minlength=self.n_sets)
+        n = np.bincount(labels, minlength=self.n_sets)
+        R = np.linalg.norm(resultants, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(n > 1, (n - 1) / (n - R), np.nan)
+
+    def _log_likelihoods(self, X: np.ndarray) -> np.ndarray:
+        '''log of weight * density of the axial von Mises-Fisher distribution
+        f(x) = K / (4 pi sinh(K)) * cosh(K mu x) of every set'''
+        k = self.kappas
+        a = np.abs(X @ self.centers.T) * k
+        log_cosh = a + np.log1p(np.exp(-2 * a)) - np.log(2)
+        log_sinh = k + np.log1p(-np.exp(-2 * k)) - np.log(2)
+        return (np.log(self.weights) + np.log(k) - np.log(4 * np.pi)
+                - log_sinh + log_cosh)
+
+    def _fit_vmf(self, X: np.ndarray, centers: np.ndarray) -> None:
+        '''expectation maximization of the mixture of axial von Mises-Fisher
+        distributions, started from the k-means axes; sets centers, kappas,
+        weights and log_likelihood'''
+        self.centers = centers
+        self.weights = np.full(self.n_sets, 1 / self.n_sets)
+        self.kappas = np.nan_to_num(np.maximum(
+            self._fisher_k(X, self._assign(X, centers), centers), 1), nan=1.0)
+
+        log_likelihood = -np.inf
+        for _ in range(self.max_iter):
+            # E-step in chunks: sufficient statistics of the responsibilities
+            resp_sum = np.zeros(self.n_sets)
+            resultants = np.zeros((self.n_sets, 3))
+            total = 0
+            for i in range(0, len(X), self.chunk_size):
+                x = X[i:i+self.chunk_size]
+                log_p = self._log_likelihoods(x)
+                log_norm = np.logaddexp.reduce(log_p, axis=1)
+                total += log_norm.sum()
+                resp = np.exp(log_p - log_norm[:, None])
+                # the antipodal halves of a set are weighted by tanh(K mu x)
+                signs = np.tanh(self.kappas * (x @ self.centers.T))
+                resp_sum += resp.sum(axis=0)
+                resultants += (resp * signs).T @ x
+
+            # M-step; K after the approximation of Banerjee et al. (2005)
+            R = np.linalg.norm(resultants, axis=1)
+            self.centers = np.where(
+                R[:, None] > 0, resultants / np.maximum(R, 1e-300)[:, None],
+                self.centers)
+            self.weights = np.maximum(resp_sum / len(X), 1e-300)
+            r = np.clip(R / np.maximum(resp_sum, 1e-300), 1e-6, 1 - 1e-12)
+            self.kappas = np.clip(r * (3 - r**2) / (1 - r**2), 1e-6, 1e6)
+
+            converged = abs(total - log_likelihood) < self.tol * abs(total)
+            log_likelihood = total
+            if converged:
+                break
+        self.log_likelihood = log_likelihood
+
+
+if __name__ == '__main__':
+    # example usage with three synthetical joint sets
+    import matplotlib.pyplot as plt
+    from stereonet import stereonet
+
+    rng = np.random.default_rng(0)
+    dips, dipdirs = [], []
+    for dip, dipdir, std, size in [(80, 120, 8, 4000), (75, 20, 10, 3000),
+                                   (10, 250, 6, 2000)]:
+        dips.append(np.clip(rng.normal(dip, std, size), 0, 90))
+        dipdirs.append(rng.normal(dipdir, std, size) % 360)
+    dips, dipdirs = np.concatenate(dips), np.concatenate(dipdirs)
+
+    snet = stereonet(only_reference_circle=True, figsize=(6, 6))
+    sets = JointSets(n_sets=3, method='vmf', batch_size=1000, seed=42)
+    sets.fit(snet.calc_normal_vectors(dips, dipdirs))
+    print(sets.summary())
+
+    colors = np.array(['blue', 'red', 'green'])
+    snet.plot_poles(dips, dipdirs, color=colors[sets.labels])
+    snet.plot_great_circles(*sets.mean_orientations(), add_to_snet=True,
+                            colors=colors)
+    plt.show()
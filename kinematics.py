@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Python script for the kinematic analysis of rock slopes with the normal
+vector math of "stereonet.py". For a set of discontinuities (dips and dip
+directions) the feasible failure modes are counted for many slope faces and
+friction angles at once:
+    planar sliding: the plane dips steeper than the friction angle, flatter
+        than the slope and within a lateral limit of the slope's dip direction
+    wedge sliding (Markland test): the intersection line of two planes
+        plunges steeper than the friction angle and daylights in the slope
+        face, i.e. it points out of the slope
+    flexural toppling (Goodman 1980): the plane dips into the slope within a
+        lateral limit and steeper than 90° - slope dip + friction angle
+The intersections of all pairs of planes (n * (n - 1) / 2 cross products)
+are computed in blocks of bounded size and every block is checked against all
+slope faces with matrix products, so that thousands of discontinuities and
+hundreds of slope faces are analysed in seconds.
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import numpy as np
+import pandas as pd
+
+from stereonet import stereonet
+
+snet = stereonet()
+
+
+def angle_difference(a1: np.ndarray, a2: np.ndarray) -> np.ndarray:
+    '''absolute difference of two azimuths [°] in the range 0 - 180°'''
+    return np.abs((np.asarray(a1) - np.asarray(a2) + 180) % 360 - 180)
+
+
+def trend_plunge(lineations: np.ndarray) -> tuple:
+    '''trends and plunges [°] of downward pointing unit vectors (n, 3)'''
+    trends = np.degrees(np.arctan2(lineations[:, 0], lineations[:, 1])) % 360
+    plunges = np.degrees(np.arcsin(np.clip(-lineations[:, 2], -1, 1)))
+    return trends, plunges
+
+
+def plane_intersections(dips: np.ndarray, dipdirs: np.ndarray,
+                        block_size: int = 1_000_000):
+    '''generator of the intersection lines of all pairs of planes in blocks of
+    about block_size pairs; yields the indices i < j of the planes and the
+    downward pointing unit vectors (n, 3) of their intersections. Pairs of
+    parallel planes are skipped.'''
+    normals = np.column_stack(snet.calc_normal_vectors(dips, dipdirs))
+    n = len(normals)
+    # pairs (i, j > i) per row and first pair of every row
+    row_pairs = n - 1 - np.arange(n)
+    row_starts = np.concatenate([[0], np.cumsum(row_pairs)])
+
+    a = 0
+    while a < n - 1:
+        b = np.searchsorted(row_starts, row_starts[a] + block_size,
+                            side='right') - 1
+        b = min(max(b, a + 1), n - 1)
+        i = np.repeat(np.arange(a, b), row_pairs[a:b])
+        j = (i + 1 + np.arange(len(i))
+             - np.repeat(row_starts[a:b] - row_starts[a], row_pairs[a:b]))
+        lines = np.cross(normals[i], normals[j])
+        lengths = np.linalg.norm(lines, axis=1)
+        valid = lengths > 1e-9
+        lines = lines[valid] / lengths[valid, None]
+        # intersection lines point downwards
+        lines = np.where(lines[:, 2:] > 0, -lines, lines)
+        yield i[valid], j[valid], lines
+        a = b
+
+
+def _count_exceedances(values: np.ndarray, mask: np.ndarray,
+                       friction_angles: np.ndarray) -> np.ndarray:
+    '''number of values per row (n_slopes, n) with mask that are larger than
+    each of the friction angles; histogram of the values over the sorted
+    friction angles that is accumulated from the top'''
+    order = np.argsort(friction_angles)
+    n_rows, n_phi = mask.shape[0], len(friction_angles)
+    bins = np.searchsorted(friction_angles[order], values, side='left')
+    rows = np.broadcast_to(np.arange(n_rows)[:, None], mask.shape)
+    hist = np.bincount((rows * (n_phi + 1) + bins)[mask],
+                       minlength=n_rows * (n_phi + 1)).reshape(n_rows, -1)
+    # values > phi_k are in the bins above k
+    counts = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    result = np.empty_like(counts)
+    result[:, order] = counts
+    return result
+
+
+def planar_sliding(dips: np.ndarray, dipdirs: np.ndarray,
+                   slope_dips: np.ndarray, slope_dipdirs: np.ndarray,
+                   friction_angles: np.ndarray,
+                   lateral_limit: float = 20) -> np.ndarray:
+    '''number of planes that allow planar sliding per slope face and friction
+    angle; shape (n_slopes, n_friction_angles)'''
+    dips = np.asarray(dips, dtype=float)
+    slope_dips = np.asarray(slope_dips, dtype=float)[:, None]
+    mask = ((angle_difference(dipdirs, np.asarray(slope_dipdirs)[:, None])
+             <= lateral_limit) & (dips < slope_dips))
+    return _count_exceedances(np.broadcast_to(dips, mask.shape), mask,
+                              np.asarray(friction_angles, dtype=float))
+
+
+def flexural_toppling(dips: np.ndarray, dipdirs: np.ndarray,
+                      slope_dips: np.ndarray, slope_dipdirs: np.ndarray,
+                      friction_angles: np.ndarray,
+                      lateral_limit: float = 20) -> np.ndarray:
+    '''number of planes that allow flexural toppling per slope face and
+    friction angle; shape (n_slopes, n_friction_angles)'''
+    slope_dips = np.asarray(slope_dips, dtype=float)[:, None]
+    mask = (angle_difference(dipdirs,
+                             np.asarray(slope_dipdirs)[:, None] + 180)
+            <= lateral_limit)
+    # dip > 90 - slope dip + phi  <=>  dip + slope dip - 90 > phi
+    values = np.asarray(dips, dtype=float) + slope_dips - 90
+    return _count_exceedances(values, mask,
+                              np.asarray(friction_angles, dtype=float))
+
+
+def wedge_sliding(dips: np.ndarray, dipdirs: np.ndarray,
+                  slope_dips: np.ndarray, slope_dipdirs: np.ndarray,
+                  friction_angles: np.ndarray,
+                  block_size: int = 10_000_000) -> tuple:
+    '''number of intersections of pairs of planes that allow wedge sliding
+    per slope face and friction angle, shape (n_slopes, n_friction_angles),
+    and the total number of intersections. block_size limits the number of
+    slope face - intersection combinations that are checked at once.'''
+    slopes = np.column_stack(snet.calc_normal_vectors(slope_dips,
+                                                      slope_dipdirs))
+    friction_angles = np.asarray(friction_angles, dtype=float)
+    counts = np.zeros((len(slopes), len(friction_angles)))
+    n_intersections = 0
+    for _, _, lines in plane_intersections(
+            dips, dipdirs, block_size=max(block_size // len(slopes), 1)):
+        # a downward line daylights if it points out of the slope face, i.e.
+        # if it has a positive component along the slope's upward normal
+        daylight = (slopes @ lines.T > 0).astype(np.float32)
+        plunges = np.degrees(np.arcsin(np.clip(-lines[:, 2], -1, 1)))
+        steep = (plunges[:, None] > friction_angles).astype(np.float32)
+        counts += daylight @ steep
+        n_intersections += len(lines)
+    return counts.round().astype(np.int64), n_intersections
+
+
+def kinematic_analysis(dips: np.ndarray, dipdirs: np.ndarray,
+                       slope_dips: np.ndarray, slope_dipdirs: np.ndarray,
+                       friction_angles: np.ndarray,
+                       lateral_limit: float = 20,
+                       block_size: int = 10_000_000) -> pd.DataFrame:
+    '''counts and percentages of the feasible failure modes for all
+    combinations of slope faces (pairs of slope_dips and slope_dipdirs) and
+    friction angles'''
+    args = (dips, dipdirs, slope_dips, slope_dipdirs, friction_angles)
+    planar = planar_sliding(*args, lateral_limit=lateral_limit)
+    toppling = flexural_toppling(*args, lateral_limit=lateral_limit)
+    wedge, n_intersections = wedge_sliding(*args, block_size=block_size)
+
+    n_slopes, n_phi = planar.shape
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(slope_dips, n_phi), np.repeat(slope_dipdirs, n_phi),
+         np.tile(friction_angles, n_slopes)],
+        names=['slope dip [°]', 'slope dip direction [°]',
+               'friction angle [°]'])
+    n_planes = len(dips)
+    return pd.DataFrame({
+        'planar sliding': planar.ravel(),
+        'planar sliding [%]': planar.ravel() / n_planes * 100,
+        'wedge sliding': wedge.ravel(),
+        'wedge sliding [%]': wedge.ravel() / max(n_intersections, 1) * 100,
+        'flexural toppling': toppling.ravel(),
+        'flexural toppling [%]': toppling.ravel() / n_planes * 100},
+        index=index)
+
+
+if __name__ == '__main__':
+    # example usage: 2000 random discontinuities against slope faces with
+    # dips of 40° - 90° in all directions and three friction angles
+    import time
+
+    rng = np.random.default_rng(0)
+    dips = rng.uniform(0, 90, 2000)
+    dipdirs = rng.uniform(0, 360, 2000)
+    slope_dips, slope_dipdirs = np.meshgrid(np.arange(40, 91, 10),
+                                            np.arange(0, 360, 10))
+
+    t_start = time.perf_counter()
+    df = kinematic_analysis(dips, dipdirs, slope_dips.ravel(),
+                            slope_dipdirs.ravel(), [25, 30, 35])
+    print(f'{len(df)} cases in {time.perf_counter() - t_start:.1f} s')
+    print(df.head(12))
@@ -3,39 +3,13 @@ import mpl_toolkits.mplot3d.art3d as art3d
 from mpl_toolkits.mplot3d import axes3d
 from matplotlib.patches import Circle, Wedge, PathPatch
 
-import numpy as np
 import pandas as pd
 
+from mean_orientation import fisher_statistics, resultant
+from stereonet import stereonet
+
 
 ##### functions #####
-def normal_vectors(dips, dipdirs):
-    
-    n_X = np.sin(np.radians(dips)) * np.sin(np.radians(dipdirs))
-    n_Y = np.sin(np.radians(dips)) * np.cos(np.radians(dipdirs))
-    n_Z = np.cos(np.radians(dips))
-   
-    return n_X, n_Y, n_Z
-        
-def mean_unit_vector(normal_vectors):
-    # summing up of normal vector coordinates ####
-    sum_n_X = sum(normal_vectors[0])
-    sum_n_Y = sum(normal_vectors[1])
-    sum_n_Z = sum(normal_vectors[2])
-    
-    ### calculating mean unit vector ### 
-    norm_vector = np.sqrt(sum_n_X**2 + sum_n_Y**2 + sum_n_Z**2)
-    norm_n_X = sum_n_X / norm_vector
-    norm_n_Y = sum_n_Y / norm_vector
-    norm_n_Z = sum_n_Z / norm_vector
-    
-    return norm_n_X, norm_n_Y, norm_n_Z
-        
-def backcalculation(mean_unit_vector): # backcalculation to dipdirection and dip
-    mean_DipDir = (360 - np.arctan2(mean_unit_vector[1], mean_unit_vector[0]) * (180/np.pi))+90
-    mean_Dip = np.arccos(mean_unit_vector[2])*(180/np.pi)
-    
-    return round(mean_DipDir, 1), round(mean_Dip,1)
-        
 def print_result(backcalculation):
     backcalculation = list(backcalculation)
     if backcalculation[0] > 360:
@@ -63,22 +37,27 @@ df = pd.read_csv(File_Path, delimiter = delim, usecols = [col_dip, col_dipdir],
                  encoding = 'iso8859_15') #with encoding "iso8859_15" pandas is able to read letters like "Ä,Ö,Ü" that are used in German...
 
 ##### calculations #####
-print_result(backcalculation(mean_unit_vector(normal_vectors(df[col_dip], df[col_dipdir]))))
+n_vecs = stereonet().calc_normal_vectors(df[col_dip].to_numpy(),
+                                         df[col_dipdir].to_numpy())
+n, resultant_vector = resultant(n_vecs)
+stats = fisher_statistics(n, resultant_vector)
+mean_vector = resultant_vector / stats['R']
+print_result((round(stats['dip direction [°]'], 1), round(stats['dip [°]'], 1)))
+print('Fisher K: {}, alpha95: {}°'.format(round(stats['Fisher K'], 1),
+                                          round(stats['alpha95 [°]'], 1)))
 
 
 ##### 3D plot #####
-n_X = normal_vectors(df[col_dip], df[col_dipdir])[0] * -1 # *-1 for lower hemisphere projection
-n_Y = normal_vectors(df[col_dip], df[col_dipdir])[1] * -1
-n_Z = normal_vectors(df[col_dip], df[col_dipdir])[2] * -1
+n_X, n_Y, n_Z = [n_vec * -1 for n_vec in n_vecs] # *-1 for lower hemisphere projection
 
 fig = plt.figure(figsize = (9,9))
 ax1 = fig.add_subplot(111, projection = '3d')
 
 ax1.scatter(n_X, n_Y, n_Z,s = 2, color = 'black') #pole points
 
-ax1.plot([0, mean_unit_vector(normal_vectors(df[col_dip], df[col_dipdir]))[0]*-2],
-          [0, mean_unit_vector(normal_vectors(df[col_dip], df[col_dipdir]))[1]*-2],
-          [0, mean_unit_vector(normal_vectors(df[col_dip], df[col_dipdir]))[2]*-2],
+ax1.plot([0, mean_vector[0]*-2],
+          [0, mean_vector[1]*-2],
+          [0, mean_vector[2]*-2],
           color = 'red') # mean orientation polevector
 
 
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Python script that computes the mean orientation of structural geological
+data (e.g. joints, bedding, foliation) via vector summation, together with
+the Fisher (1953) statistics of the orientations: resultant length, mean
+resultant length, Fisher's K and the 95 % confidence cone alpha95. The .csv
+file is streamed in chunks and only the sums of the normal vectors are kept,
+so that mapping exports of several GB are summarized in constant memory.
+Optionally the statistics are computed per group of a column, e.g. per joint
+set or per borehole.
+For data that is not Fisher distributed (e.g. skewed joint sets), confidence
+cones of the mean orientation can be estimated with a bootstrap of the normal
+vectors (see bootstrap_cones); the cones can be drawn with
+stereonet.plot_cones.
+
+example usage from the command line:
+    python mean_orientation.py mapping.csv --dip dip --dipdir dipdir
+        --group-by "joint set" --output mean_orientations.csv
+
+No guarantee is given on the flawless functionality of the code and the code is
+licensed under the MIT License (see license file in repository).
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from stereonet import stereonet
+
+snet = stereonet()
+
+STAT_COLUMNS = ['n', 'dip direction [°]', 'dip [°]', 'pole trend [°]',
+                'pole plunge [°]', 'R', 'mean resultant length', 'Fisher K',
+                'alpha95 [°]']
+
+
+def resultant(n_vecs: tuple) -> tuple:
+    '''number of vectors and their resultant vector (vector sum); vectors of
+    missing measurements are skipped'''
+    n_vecs = np.vstack(n_vecs)
+    valid = np.isfinite(n_vecs).all(axis=0)
+    return int(valid.sum()), n_vecs[:, valid].sum(axis=1)
+
+
+def fisher_statistics(n: int, resultant_vector: np.ndarray,
+                      p: float = 0.05) -> dict:
+    '''mean orientation and Fisher statistics from the number of normal
+    vectors and their resultant vector. alpha95 is the half apex angle of the
+    cone that contains the true mean with a probability of 1 - p.'''
+    R = np.linalg.norm(resultant_vector)
+    n_X, n_Y, n_Z = resultant_vector / R
+    dipdir = np.degrees(np.arctan2(n_X, n_Y)) % 360
+    dip = np.degrees(np.arccos(np.clip(n_Z, -1, 1)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        K = (n - 1) / (n - R) if n > 1 else np.nan
+        cos_alpha = 1 - (n - R) / R * ((1 / p)**(1 / (n - 1)) - 1)
+        alpha95 = (np.degrees(np.arccos(np.clip(cos_alpha, -1, 1)))
+                   if n > 1 else np.nan)
+    return {'n': n, 'dip direction [°]': dipdir, 'dip [°]': dip,
+            'pole trend [°]': (dipdir + 180) % 360,
+            'pole plunge [°]': 90 - dip, 'R': R,
+            'mean resultant length': R / n, 'Fisher K': K,
+            'alpha95 [°]': alpha95}
+
+
+def accumulate(df: pd.DataFrame, col_dip: str, col_dipdir: str,
+               group_col: str = None) -> pd.DataFrame:
+    '''number of measurements and sums of the normal vectors of a dataframe,
+    per group of group_col if given'''
+    df = df.dropna(subset=[col_dip, col_dipdir])
+    n_X, n_Y, n_Z = snet.calc_normal_vectors(
+        df[col_dip].to_numpy(dtype=float),
+        df[col_dipdir].to_numpy(dtype=float))
+    sums = pd.DataFrame({'n': np.ones(len(df), dtype=np.int64),
+                         'n_X': n_X, 'n_Y': n_Y, 'n_Z': n_Z}, index=df.index)
+    if group_col is None:
+        return sums.sum().to_frame('all').T
+    return sums.groupby(df[group_col].to_numpy()).sum()
+
+
+def mean_orientation(filepath: str, col_dip: str, col_dipdir: str,
+                     group_col: str = None, delimiter: str = ',',
+                     encoding: str = 'iso8859_15',
+                     chunk_size: int = 1_000_000,
+                     p: float = 0.05) -> pd.DataFrame:
+    '''streams a .csv file in chunks of chunk_size rows and returns the mean
+    orientation and Fisher statistics of all measurements, or per group of
+    group_col if given; the default encoding "iso8859_15" reads letters like
+    "Ä,Ö,Ü" that are used in German'''
+    usecols = [col_dip, col_dipdir] + ([group_col] if group_col else [])
+    sums = None
+    for df in pd.read_csv(filepath, delimiter=delimiter, usecols=usecols,
+                          encoding=encoding, chunksize=chunk_size):
+        chunk_sums = accumulate(df, col_dip, col_dipdir, group_col)
+        sums = (chunk_sums if sums is None
+                else sums.add(chunk_sums, fill_value=0))
+    if sums is None:
+        raise ValueError(f'no measurements in {filepath}')
+
+    rows = {group: fisher_statistics(int(row['n']),
+                                     row[['n_X', 'n_Y', 'n_Z']].to_numpy(),
+                                     p=p)
+            for group, row in sums.iterrows() if row['n'] > 0}
+    df_stats = pd.DataFrame.from_dict(rows, orient='index',
+                                      columns=STAT_COLUMNS)
+    df_stats.index.name = group_col
+    return df_stats
+
+
+def bootstrap_cones(n_vecs: tuple, n_boot: int = 10_000,
+                    levels: tuple = (0.95,), seed: int = None,
+                    n_workers: int = 1, block_size: int = 10_000_000) -> tuple:
+    '''confidence cones of the mean orientation from n_boot bootstrap
+    replicates of the normal vectors. The replicates are drawn in blocks of
+    at most block_size replicate x vector counts and the mean vectors of all
+    replicates of a block are computed with one matrix product; the blocks
+    are spread across n_workers processes. Every block gets its own seed
+    that is derived from seed, so results do not depend on n_workers.
+    returns a dictionary with the mean orientation and the half apex angles
+    of the cones of the confidence levels and the small circles of the cones
+    (n_levels, n_points, 2) in the stereonet projection'''
+    n_vecs = np.vstack(n_vecs)
+    X = n_vecs[:, np.isfinite(n_vecs).all(axis=0)].T
+    n = len(X)
+    if n < 2:
+        raise ValueError('bootstrap requires at least two measurements')
+    mean_vector = X.sum(axis=0) / np.linalg.norm(X.sum(axis=0))
+
+    per_block = max(block_size // n, 1)
+    sizes = [min(per_block, n_boot - i) for i in range(0, n_boot, per_block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(X, mean_vector, size, s) for size, s in zip(sizes, seeds)]
+    if n_workers > 1:
+        with ProcessPoolExecutor(n_workers) as executor:
+            angles = list(executor.map(_bootstrap_block, jobs))
+    else:
+        angles = [_bootstrap_block(job) for job in jobs]
+    angles = np.concatenate(angles)
+
+    n_X, n_Y, n_Z = mean_vector
+    dipdir = np.degrees(np.arctan2(n_X, n_Y)) % 360
+    dip = np.degrees(np.arccos(np.clip(n_Z, -1, 1)))
+    cones = np.percentile(angles, np.asarray(levels) * 100)
+    result = {'n': n, 'n boot': n_boot, 'dip direction [°]': dipdir,
+              'dip [°]': dip}
+    result.update({f'cone {level * 100:g} [°]': cone
+                   for level, cone in zip(levels, cones)})
+    circles = snet.calc_cone_arcs(np.full(len(cones), dip),
+                                  np.full(len(cones), dipdir), cones)
+    return result, circles
+
+
+def _bootstrap_block(job: tuple) -> np.ndarray:
+    '''angles [°] between the means of one block of bootstrap replicates and
+    the mean of the sample; module level function so that it can be sent to
+    worker processes'''
+    X, mean_vector, size, seed = job
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    # how often every vector is drawn in every replicate
+    draws = rng.integers(0, n, (size, n)) + np.arange(size)[:, None] * n
+    counts = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n)
+    resultants = counts.astype(float) @ X
+    cos = (resultants @ mean_vector) / np.linalg.norm(resultants, axis=1)
+    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='mean orientation and Fisher statistics of structural '
+        'geological data in a .csv file')
+    parser.add_argument('filepath', help='.csv file with the measurements')
+    parser.add_argument('--dip', required=True,
+                        help='name of column with dip')
+    parser.add_argument('--dipdir', required=True,
+                        help='name of column with dip direction')
+    parser.add_argument('--group-by', default=None,
+                        help='name of column to group the measurements by, '
+                        'e.g. joint set or borehole')
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--encoding', default='iso8859_15')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000,
+                        help='number of rows that are read at once')
+    parser.add_argument('--output', default=None,
+                        help='.csv file to save the statistics')
+    args = parser.parse_args()
+
+    df_stats = mean_orientation(args.filepath, args.dip, args.dipdir,
+                                group_col=args.group_by,
+                                delimiter=args.delimiter,
+                                encoding=args.encoding,
+                                chunk_size=args.chunk_size)
+    print(df_stats.round(1).to_string())
+    if args.output is not None:
+        df_stats.to_csv(args.output)
@@ -13,12 +13,21 @@ freely available under:
 https://www.rocscience.com/assets/resources/learning/Block-Theory-and-Its-Application-to-Rock-Engineering.pdf
 '''
 
+from matplotlib.collections import LineCollection
+from matplotlib.patches import Wedge
 import matplotlib.pyplot as plt
 import numpy as np
+from scipy.spatial import cKDTree
 
 
 class stereonet:
 
+    # evaluation grids of the pole density per resolution (shared by all
+    # instances): grid coordinates, unit vectors and KD-tree of the vectors
+    density_grids = {}
+    # cached grid lines of the background per (grid_steps, projection)
+    grid_lines = {}
+
     def __init__(self, color='black', figsize=(6, 6),
                  only_reference_circle=True, grid_steps=10):
 
@@ -26,6 +35,7 @@ class stereonet:
         self.figsize = figsize
         self.only_reference_circle = only_reference_circle
         self.grid_steps = grid_steps
+        self.projection = 'wulff'  # only the wulff net is implemented
 
     # calc_small_circle() is used for drawing the stereonet's grid only
     def calc_small_circle(self, kd):
@@ -35,65 +45,76 @@ class stereonet:
         Cy = 1/np.cos(np.radians(kd))
         return Cx, Cy, R
 
-    # draw stereonet grid (wulff met)
+    # grid lines of the stereonet (great circles, small circles and axes) as
+    # a list of vertex arrays; cached per grid_steps and projection
+    def calc_grid_lines(self):
+
+        key = (self.grid_steps, self.projection)
+        if key not in stereonet.grid_lines:
+            background_dips = np.arange(0, 90, step=self.grid_steps)
+            lines = [np.array([[-100, 0], [100, 0]]),
+                     np.array([[0, -100], [0, 100]])]
+            for dipdir in [270, 90]:
+                lines += list(self.calc_great_circle_arcs(
+                    background_dips, np.full(background_dips.shape, dipdir)))
+            t = np.linspace(0, 2*np.pi, 200)
+            for dip in np.arange(10, 90, step=self.grid_steps):
+                Cx, Cy, R = self.calc_small_circle(dip)
+                for sign in [1, -1]:
+                    lines.append(np.column_stack((Cx + R*np.cos(t),
+                                                  sign*Cy + R*np.sin(t))))
+            stereonet.grid_lines[key] = lines
+        return stereonet.grid_lines[key]
+
+    # draw stereonet grid (wulff met); the grid is drawn from the cached
+    # grid lines as one collection
     def draw_stereonet(self):
 
         fig, ax = plt.subplots()
 
         ref_circle = plt.Circle((0, 0), 1, color=self.color,
-                                fill=None, linewidth=1.4, zorder=3)
+                                fill=None, linewidth=1.4, zorder=3,
+                                gid='stereonet background')
         ax.add_artist(ref_circle)
 
         # to hide the second hemisphere and add annotations
         if self.only_reference_circle is True:
-            ax.text(0, 1.05, '0° / 360°', horizontalalignment='center',
-                    verticalalignment='center')
-            ax.text(1.05, 0, '90°', verticalalignment='center',
-                    horizontalalignment='left')
-            ax.text(0, -1.05, '180°', horizontalalignment='center',
-                    verticalalignment='center')
-            ax.text(-1.05, 0, '270°', verticalalignment='center',
-                    horizontalalignment='right')
-
-            inner, outer = 1, 10  # taken from: https://stackoverflow.com/questions/22789356/plot-a-donut-with-fill-or-fill-between-use-pyplot-in-matplotlib
-            x = np.linspace(-outer, outer, 1000, endpoint=True)
-            # x-axis values -> outer circle
-            yO = outer*np.sin(np.arccos(x/outer))
-            # x-axis values -> inner circle (with nan's beyond circle)
-            yI = inner*np.sin(np.arccos(x/inner))
-            # yI now looks like a boulder hat, meeting yO at the outer points
-            yI[np.isnan(yI)] = 0.
-            ax.fill_between(x, yI, yO, color="white", zorder=2)
-            ax.fill_between(x, -yO, -yI, color="white", zorder=2)
-
-        # horizontal grid line
-        ax.plot((-100, 100), (0, 0), color='grey', linewidth=0.2, zorder=1)
-        # vertical grid line
-        ax.plot((0, 0), (-100, 100), color='grey', linewidth=0.2, zorder=1)
-
-        # draw great circles
-        for dipdir in [270, 90]:
-            background_dips = np.arange(0, 90, step=self.grid_steps)
-            self.plot_great_circles(background_dips,
-                                    np.full(background_dips.shape, dipdir),
-                                    add_to_snet=True, colors=['grey'],
-                                    linewidth=0.2, linestyle='-')
-
-        # draw small circles
-        for dip in np.arange(10, 90, step=self.grid_steps):
-            SC_params = self.calc_small_circle(dip)
-            SC_pos = plt.Circle((SC_params[0], SC_params[1]), SC_params[2],
-                                color='grey', fill=None, linewidth=0.2)
-            SC_neg = plt.Circle((SC_params[0], -SC_params[1]), SC_params[2],
-                                color='grey', fill=None, linewidth=0.2)
-            ax.add_artist(SC_pos)
-            ax.add_artist(SC_neg)
+            for x, y, label, ha, va in [(0, 1.05, '0° / 360°', 'center',
+                                         'center'),
+                                        (1.05, 0, '90°', 'left', 'center'),
+                                        (0, -1.05, '180°', 'center',
+                                         'center'),
+                                        (-1.05, 0, '270°', 'right',
+                                         'center')]:
+                ax.text(x, y, label, horizontalalignment=ha,
+                        verticalalignment=va, gid='stereonet background')
+
+            # white ring from the reference circle outwards
+            ax.add_patch(Wedge((0, 0), 10, 0, 360, width=9, color='white',
+                               zorder=2, gid='stereonet background'))
+
+        ax.add_collection(LineCollection(
+            self.calc_grid_lines(), colors='grey', linewidths=0.2,
+            zorder=1, gid='stereonet background'))
 
         ax.axis('equal')
         ax.axis([-1.1, 1.1, -1.1, 1.1])
         ax.set_axis_off()
         fig.set_size_inches(self.figsize)
 
+    # removes everything but the background from a stereonet, so that the
+    # figure can be reused for the next data set
+    def clear_data(self, ax=None):
+
+        if ax is None:
+            ax = plt.gca()
+        # data artists are all artists without the background tag
+        for artists in [ax.collections, ax.lines, ax.patches, ax.texts,
+                        ax.images, ax.artists]:
+            for artist in list(artists):
+                if artist.get_gid() != 'stereonet background':
+                    artist.remove()
+
     def calc_normal_vectors(self, dips, dipdirs):
 
         # calculate upward directed normals
@@ -126,70 +147,160 @@ class stereonet:
         ax.scatter(plane_poles[0], plane_poles[1], color=color,
                    s=size, zorder=4)
 
+    def calc_density_grid(self, resolution=100):
+
+        # regular grid in the projection plane, back-projected onto the lower
+        # hemisphere; cached per resolution
+        if resolution not in stereonet.density_grids:
+            X, Y = np.meshgrid(np.linspace(-1, 1, resolution),
+                               np.linspace(-1, 1, resolution))
+            r2 = X**2 + Y**2
+            inside = r2 <= 1
+            vecs = np.column_stack((2*X[inside], 2*Y[inside],
+                                    r2[inside] - 1)) / (1 + r2[inside, None])
+            stereonet.density_grids[resolution] = (X, Y, inside, vecs,
+                                                   cKDTree(vecs))
+        return stereonet.density_grids[resolution]
+
+    def calc_pole_density(self, n_vecs, method='kamb', sigma=3,
+                          resolution=100, chunk_size=100000):
+
+        # density of the poles (lower hemisphere unit vectors) on the grid in
+        # multiples of the standard deviation of a uniform distribution;
+        # 'kamb': counting cones (Kamb 1959), 'fisher': exponential
+        # (Fisher) kernel after Vollmer (1995)
+        X, Y, inside, grid_vecs, grid_tree = self.calc_density_grid(
+            resolution)
+        poles = -np.column_stack(n_vecs)
+        n = len(poles)
+        if method == 'kamb':
+            cone = sigma**2 / (n + sigma**2)  # 1 - cos(cone angle)
+            max_dist = np.sqrt(2 * cone)
+            units = np.sqrt(n * cone * (1 - cone))
+        elif method == 'fisher':
+            k = 2 * (1 + n / sigma**2)
+            # neglect weights below 1e-6
+            max_dist = np.sqrt(2 * min(np.log(1e6) / k, 2))
+            units = np.sqrt(n * (k / 2 - 1) / k**2)
+        else:
+            raise ValueError(f'unknown method {method}')
+
+        totals = np.zeros(len(grid_vecs))
+        for i in range(0, n, chunk_size):
+            # poles and their antipodes to account for the axial data at the
+            # primitive circle
+            chunk = poles[i:i+chunk_size]
+            pole_tree = cKDTree(np.vstack((chunk, -chunk)))
+            pairs = grid_tree.sparse_distance_matrix(
+                pole_tree, max_dist, output_type='ndarray')
+            if method == 'kamb':
+                weights = np.ones(len(pairs))
+            else:
+                # squared chord distance = 2 * (1 - cos(angle))
+                weights = np.exp(-k * pairs['v']**2 / 2)
+            totals += np.bincount(pairs['i'], weights=weights,
+                                  minlength=len(grid_vecs))
+
+        density = np.full(X.shape, np.nan)
+        density[inside] = totals / units
+        return X, Y, density
+
+    def plot_pole_density(self, dips, dipdirs, add_to_snet=False,
+                          method='kamb', sigma=3, resolution=100,
+                          levels=None, cmap='Blues'):
+
+        if add_to_snet is False:
+            self.draw_stereonet()
+        ax = plt.gca()
+
+        X, Y, density = self.calc_pole_density(
+            self.calc_normal_vectors(dips, dipdirs), method=method,
+            sigma=sigma, resolution=resolution)
+        if levels is None:
+            levels = np.arange(0, np.nanmax(density) + 2, 2)
+        ax.contourf(X, Y, density, levels=levels, cmap=cmap, zorder=0)
+        ax.contour(X, Y, density, levels=levels, colors='black',
+                   linewidths=0.3, zorder=0)
+
+    def calc_great_circle_arcs(self, dips, dipdirs, n_points=100):
+
+        # lines within every plane from one end of the strike line (t = 0)
+        # over the dip vector (t = pi/2) to the other end (t = pi); all of
+        # them point into the lower hemisphere. Horizontal planes are the
+        # whole primitive circle (t up to 2 pi).
+        dips = np.radians(np.asarray(dips, dtype=float))[:, None]
+        dipdirs = np.radians(np.asarray(dipdirs, dtype=float))[:, None]
+        t_max = np.where(dips == 0, 2*np.pi, np.pi)
+        t = np.linspace(0, 1, n_points)[None, :] * t_max
+        x = (np.cos(t) * -np.cos(dipdirs)
+             + np.sin(t) * np.sin(dipdirs) * np.cos(dips))
+        y = (np.cos(t) * np.sin(dipdirs)
+             + np.sin(t) * np.cos(dipdirs) * np.cos(dips))
+        z = np.sin(t) * -np.sin(dips)
+        # stereographic projection; the arcs end on the primitive circle
+        return np.stack((x / (1 - z), y / (1 - z)), axis=-1)
+
     def plot_great_circles(self, dips, dipdirs,
                            add_to_snet=False, colors=[], linewidth=1,
                            linestyle='-'):
 
         if add_to_snet is False:
             self.draw_stereonet()
-        else:
-            ax = plt.gca()
+        ax = plt.gca()
 
-        # calculates parameters to plot circles (i.e. center coordinates and
-        # radius)
-        def calc_great_circle_params(dip, dipdir):
-            if dip == 90:
-                return [0, 0, 0]
-            else:
-                R = 1/(np.cos(np.radians(dip)))  # radius
-                center_x = np.tan(np.radians(dip))*np.sin(np.radians(dipdir))
-                center_y = np.tan(np.radians(dip))*np.cos(np.radians(dipdir))
-                return -center_x, -center_y, -R
-
-        # function calculates the coordinates of the straight line that
-        # represents a vertical plane. ...otherwise an infinite large
-        # circle would be required.
-        def calc_vertical_plane_params(dipdir):
-            if dipdir < 90:
-                x_coord = np.cos(np.radians(dipdir))
-                y_coord = -np.sin(np.radians(dipdir))
-            elif dipdir > 90 and dipdir < 180:
-                x_coord = np.sin(np.radians(dipdir - 90))
-                y_coord = np.cos(np.radians(dipdir - 90))
-            elif dipdir > 180 and dipdir < 270:
-                x_coord = -np.cos(np.radians(dipdir - 180))
-                y_coord = np.sin(np.radians(dipdir - 180))
-            else:
-                x_coord = np.sin(np.radians(dipdir - 270))
-                y_coord = np.cos(np.radians(dipdir - 270))
-
-            return x_coord*100, y_coord*100
-
-        colors = (len(dips))*colors
-
-        for i in range(len(dips)):
-            GC = calc_great_circle_params(dips[i], dipdirs[i])
-            if GC[2] == 0:
-                if dipdirs[i] == 270 or dipdirs[i] == 90:
-                    # vertical line:
-                    ax.plot((0, 0), (-100, 100), color=colors[i],
-                            linewidth=linewidth, linestyle=linestyle,
-                            zorder=1)
-                elif dipdirs[i] == 360 or dipdirs[i] == 180 or dipdirs[i] == 0:
-                    # horizontal line:
-                    ax.plot((-100, 100), (0, 0), color=colors[i],
-                            linewidth=linewidth, linestyle=linestyle,
-                            zorder=1)
-                else:
-                    x_coord, y_coord = calc_vertical_plane_params(dipdirs[i])
-                    ax.plot((-x_coord, x_coord), (-y_coord, y_coord),
-                            color=colors[i], linewidth=linewidth,
-                            linestyle=linestyle, zorder=1)
-            else:
-                GC = plt.Circle((GC[0], GC[1]), GC[2], fill=None,
-                                color=colors[i], linewidth=linewidth,
-                                linestyle=linestyle)
-                ax.add_artist(GC)
+        # (n planes x points x 2) vertices of all great circles, drawn as one
+        # collection with one color per plane (colors are repeated)
+        arcs = self.calc_great_circle_arcs(dips, dipdirs)
+        if len(colors) == 0:
+            colors = [self.color]
+        colors = [colors[i % len(colors)] for i in range(len(arcs))]
+
+        GCs = LineCollection(arcs, colors=colors, linewidths=linewidth,
+                             linestyles=linestyle, zorder=1)
+        ax.add_collection(GCs)
+
+    def calc_cone_arcs(self, dips, dipdirs, angles, n_points=360):
+
+        # small circles with the half apex angles around the poles of the
+        # planes (e.g. confidence cones); parts in the upper hemisphere are
+        # drawn at the opposite side of the net and the jumps in between are
+        # left open (nan)
+        n_vecs = self.calc_normal_vectors(np.asarray(dips, dtype=float),
+                                          np.asarray(dipdirs, dtype=float))
+        poles = -np.column_stack(n_vecs)[:, None, :]
+        # two horizontal / dipping unit vectors perpendicular to the poles
+        u = np.column_stack((np.cos(np.radians(dipdirs)),
+                             -np.sin(np.radians(dipdirs)),
+                             np.zeros(len(poles))))[:, None, :]
+        w = np.cross(poles, u)
+        angles = np.radians(np.asarray(angles, dtype=float))[:, None, None]
+        t = np.linspace(0, 2*np.pi, n_points)[None, :, None]
+        points = (np.cos(angles) * poles
+                  + np.sin(angles) * (np.cos(t) * u + np.sin(t) * w))
+        upper = points[:, :, 2] > 0
+        points = np.where(upper[:, :, None], -points, points)
+        arcs = np.stack((points[:, :, 0] / (1 - points[:, :, 2]),
+                         points[:, :, 1] / (1 - points[:, :, 2])), axis=-1)
+        jumps = np.zeros(upper.shape, dtype=bool)
+        jumps[:, 1:] = upper[:, 1:] != upper[:, :-1]
+        arcs[jumps] = np.nan
+        return arcs
+
+    def plot_cones(self, dips, dipdirs, angles, add_to_snet=False,
+                   colors=[], linewidth=1, linestyle='-'):
+
+        if add_to_snet is False:
+            self.draw_stereonet()
+        ax = plt.gca()
+
+        arcs = self.calc_cone_arcs(dips, dipdirs, angles)
+        if len(colors) == 0:
+            colors = [self.color]
+        colors = [colors[i % len(colors)] for i in range(len(arcs))]
+
+        cones = LineCollection(arcs, colors=colors, linewidths=linewidth,
+                               linestyles=linestyle, zorder=4)
+        ax.add_collection(cones)
 
 
 #### example plot #####